@@ -1,7 +1,175 @@
 #!/usr/bin/env python3
 import sys
-import json
-from typing import Any, Dict, Optional
+import heapq
+from functools import lru_cache
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:  # optional C-accelerated JSON; fall back to stdlib json
+    orjson = None
+
+
+# stdlib json is only imported when orjson is missing, keeping startup lean
+def _loads(b: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(b)
+    import json
+    return json.loads(b)
+
+
+def _dumps(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    import json
+    return json.dumps(obj, indent=2).encode()
+
+
+STARTUP_SYSCALLS = frozenset(("execve", "mmap", "munmap", "mprotect", "brk", "access", "openat", "close", "fstat", "read"))
+
+# Classification thresholds
+SHORT_APP_ELAPSED_S = 0.1      # runs shorter than this may be startup-dominated
+STARTUP_SYSCALL_FRAC = 0.7     # share of syscall time spent in STARTUP_SYSCALLS
+IO_WAIT_FRAC = 0.2             # wait_time / elapsed
+IO_SYSCALL_FRAC = 0.3          # syscall seconds / elapsed
+LLC_MISS_HI = 5.0              # %
+LLC_MISS_STRONG = 30.0         # %
+L1D_MISS_HI = 10.0             # %
+DTLB_MISS_HI = 1.0             # %
+RAM_BW_HI_MBPS = 1000.0        # ~1 GB/s
+STALL_PCT = 20.0               # stalls at or above this support Memory, below it support compute-bound
+STALL_HI_PCT = 30.0            # %
+BRANCH_MISS_HI = 5.0           # %
+IPC_COMPUTE = 1.5
+IPC_LOW = 1.0                  # below this IPC is "low"; at or above it a CPU-bound run can scale
+IPC_PARALLEL_MEDIUM = 0.9      # minimum IPC for "medium" parallel potential
+IPC_MODERATE_MAX = 2.0         # IPC_LOW <= ipc < this suggests SIMD headroom
+CORE_UTIL_BUSY_PCT = 85.0      # per-core utilisation at or above this leaves little idle capacity
+
+# Suggestion thresholds (stricter than the classification ones above; shared ones reuse them)
+SUGGEST_LLC_MISS = 10.0        # %
+SUGGEST_L1D_MISS = 15.0        # %
+SUGGEST_DTLB_MISS = 2.0        # %
+SUGGEST_RAM_BW_MBPS = 5000.0   # ~5 GB/s
+WRITE_DOMINANT_PCT_TIME = 90   # a write row above this share of syscall time dominates
+WRITE_HEAVY_CALLS = 10000      # write calls for the write-heavy I/O suggestion
+BUFFERED_WRITE_CALLS = 100     # write calls that hint at buffered/redirected output
+BUFFERED_WRITE_SYSCALL_FRAC = 0.1  # syscall seconds / elapsed below which writes look buffered
+CTX_SWITCH_HI_PER_S = 100      # context switches per second
+
+# Bottleneck rules in priority order: (name, predicate, reason builder). The first
+# predicate that holds picks the primary bottleneck; the last rule always matches.
+# Predicates read the metrics namespace built in classify_performance.
+BOTTLENECK_RULES = (
+    ("I/O/Wait",
+     lambda m: m.io_cond,
+     lambda m: {"io_wait_frac": round(m.wait_frac, 3), "syscalls_total_seconds": m.syscalls_total_seconds}),
+    ("Memory",
+     lambda m: m.mem_cond,
+     lambda m: {
+         "llc_miss_rate_pct": m.llc_miss_rate,
+         "l1d_miss_rate_pct": m.l1d_miss_rate,
+         "dtlb_miss_rate_pct": m.dtlb_miss_rate,
+         "backend_stall_pct": m.backend_stall_pct,
+         "ram_total_bandwidth_mbps": m.ram_total_bw,
+     }),
+    ("CPU",
+     lambda m: m.branch_miss_rate is not None and m.branch_miss_rate >= BRANCH_MISS_HI,
+     lambda m: {"branch_miss_rate_pct": m.branch_miss_rate}),
+    ("CPU",
+     lambda m: ((m.frontend_stall_pct is not None and m.frontend_stall_pct >= STALL_HI_PCT)
+                or (m.backend_stall_pct is not None and m.backend_stall_pct >= STALL_HI_PCT)),
+     lambda m: {"frontend_stall_pct": m.frontend_stall_pct, "backend_stall_pct": m.backend_stall_pct}),
+    # CPU compute-bound: decent IPC and low stalls/misses
+    ("CPU",
+     lambda m: ((m.ipc is not None and m.ipc >= IPC_COMPUTE)
+                and (m.frontend_stall_pct is None or m.frontend_stall_pct < STALL_PCT)
+                and (m.backend_stall_pct is None or m.backend_stall_pct < STALL_PCT)
+                and (m.l1d_miss_rate is None or m.l1d_miss_rate < L1D_MISS_HI)
+                and (m.llc_miss_rate is None or m.llc_miss_rate < LLC_MISS_HI)),
+     lambda m: {"ipc": m.ipc}),
+    # Default to CPU when nothing else dominates; add a small context reason
+    ("CPU",
+     lambda m: True,
+     lambda m: {
+         "ipc": m.ipc,
+         "frontend_stall_pct": m.frontend_stall_pct,
+         "backend_stall_pct": m.backend_stall_pct,
+         "branch_miss_rate_pct": m.branch_miss_rate,
+     }),
+)
+
+# Suggestion templates keyed by code. classify_performance returns (code, args)
+# pairs; render_suggestions turns them into text only when output is produced.
+SUGGESTION_TEMPLATES = {
+    "short_app": "Short-lived application (< 100ms runtime). Startup overhead dominates execution. No optimization opportunities for steady-state performance. If running many instances, consider batching or keeping process alive.",
+    "cpu.buffered_writes": "Note: Profile shows CPU-bound with {write_calls} write calls but minimal I/O time. If this program writes to stdout, profiling with redirected output may have caused buffering that masks I/O bottlenecks. Re-run without redirection for accurate interactive performance.",
+    "io.write_heavy": "High write syscall count detected. Consider buffering output or using batch writes to reduce syscall overhead.",
+    "io.generic": "I/O-bound workload detected. Consider async I/O, memory-mapped files, or reducing syscall frequency.",
+    "io.ctx_switches_high": "High context switch rate. Consider reducing lock contention or thread count.",
+    "mem.llc_very_high": "Very high LLC miss rate ({llc_miss_rate:.1f}%). Working set likely exceeds cache size. Consider reducing memory footprint, using cache-aware data structures, or blocking algorithms.",
+    "mem.llc_high": "High LLC miss rate ({llc_miss_rate:.1f}%). Consider improving data locality (e.g., structure-of-arrays vs array-of-structures, prefetching).",
+    "mem.l1d_high": "High L1 data cache miss rate ({l1d_miss_rate:.1f}%). Consider improving spatial/temporal locality or reducing random access patterns.",
+    "mem.dtlb_high": "High TLB miss rate ({dtlb_miss_rate:.1f}%). Large memory footprint with scattered access. Consider huge pages or reducing working set.",
+    "mem.ram_bw_high": "High RAM bandwidth usage ({ram_total_bw:.0f} MB/s). Memory-bandwidth bound. Consider compression, reducing data movement, or compute-to-memory-access ratio improvements.",
+    "cpu.low_ipc": "Low IPC ({ipc:.2f}). Pipeline inefficiency detected. Check for branch mispredictions, data dependencies, or inadequate instruction-level parallelism.",
+    "cpu.frontend_stalls": "High frontend stalls ({frontend_stall_pct:.1f}%). Instruction fetch bottleneck. Consider code layout optimization, reducing instruction cache misses, or removing excessive branches.",
+    "cpu.backend_stalls": "High backend stalls ({backend_stall_pct:.1f}%). Execution bottleneck. Check for long-latency operations, resource conflicts, or memory access patterns.",
+    "cpu.branch_misses": "High branch miss rate ({branch_miss_rate:.1f}%). Consider profile-guided optimization, reducing unpredictable branches, or using branchless code patterns.",
+    "cpu.single_threaded": "Good IPC ({ipc:.2f}) with single-threaded execution. Consider parallelization to utilize multiple cores.",
+    "cpu.moderate_ipc": "Moderate IPC. Consider SIMD vectorization (AVX2/AVX-512) if working with arrays or loops with independent iterations.",
+}
+
+# Metric-driven suggestions per bottleneck: (predicate, code, arg names) evaluated in order.
+# Predicates read the metrics namespace built in classify_performance.
+SUGGESTION_RULES = {
+    "Memory": (
+        (lambda m: m.llc_miss_rate is not None and m.llc_miss_rate >= LLC_MISS_STRONG,
+         "mem.llc_very_high", ("llc_miss_rate",)),
+        (lambda m: m.llc_miss_rate is not None and SUGGEST_LLC_MISS <= m.llc_miss_rate < LLC_MISS_STRONG,
+         "mem.llc_high", ("llc_miss_rate",)),
+        (lambda m: m.l1d_miss_rate is not None and m.l1d_miss_rate >= SUGGEST_L1D_MISS, "mem.l1d_high", ("l1d_miss_rate",)),
+        (lambda m: m.dtlb_miss_rate is not None and m.dtlb_miss_rate >= SUGGEST_DTLB_MISS, "mem.dtlb_high", ("dtlb_miss_rate",)),
+        (lambda m: m.ram_total_bw is not None and m.ram_total_bw >= SUGGEST_RAM_BW_MBPS, "mem.ram_bw_high", ("ram_total_bw",)),
+    ),
+    "CPU": (
+        (lambda m: m.ipc is not None and m.ipc < IPC_LOW, "cpu.low_ipc", ("ipc",)),
+        (lambda m: m.frontend_stall_pct is not None and m.frontend_stall_pct >= STALL_HI_PCT,
+         "cpu.frontend_stalls", ("frontend_stall_pct",)),
+        (lambda m: m.backend_stall_pct is not None and m.backend_stall_pct >= STALL_HI_PCT,
+         "cpu.backend_stalls", ("backend_stall_pct",)),
+        (lambda m: m.branch_miss_rate is not None and m.branch_miss_rate >= BRANCH_MISS_HI,
+         "cpu.branch_misses", ("branch_miss_rate",)),
+        (lambda m: m.ipc is not None and m.ipc >= IPC_COMPUTE and m.threads == 1, "cpu.single_threaded", ("ipc",)),
+        (lambda m: m.ipc is not None and IPC_LOW <= m.ipc < IPC_MODERATE_MAX, "cpu.moderate_ipc", ()),
+    ),
+}
+
+
+def render_suggestions(items: List[Tuple[str, Dict[str, Any]]]) -> List[str]:
+    """Render (code, args) suggestion pairs into human-readable text."""
+    return [SUGGESTION_TEMPLATES[code].format_map(args) for code, args in items]
+
+
+_PRIMITIVES = (str, int, float, bool, type(None))
+
+
+def _freeze(d: Optional[Dict[str, Any]]) -> Optional[Tuple[Tuple[str, type, Any], ...]]:
+    """Return a hashable snapshot of a flat section, or None if it holds nested values.
+    The value type is part of the key so 1, 1.0 and True do not share a cache entry.
+    """
+    if not d:
+        return ()
+    if not all(isinstance(v, _PRIMITIVES) for v in d.values()):
+        return None
+    return tuple(sorted((k, type(v), v) for k, v in d.items()))
+
+
+@lru_cache(maxsize=1024)
+def _classify_cached(*frozen: Tuple[Tuple[str, type, Any], ...]) -> Dict[str, Any]:
+    return _classify(*({k: v for k, _, v in items} for items in frozen))
+
 
 def classify_performance(
     timing: Dict[str, Any],
@@ -12,60 +180,109 @@ def classify_performance(
     syscalls: Dict[str, Any],
 ) -> Dict[str, Any]:
     """Compute performance classification from profiler JSON sections.
-    Returns a dict with keys: primary_bottleneck, parallel_potential, confidence, reasons.
+    Returns a dict with keys: primary_bottleneck, parallel_potential, confidence, reasons,
+    suggestions. Suggestions are (code, args) pairs; pass them to render_suggestions for text.
+
+    Sections made only of primitive values (e.g. no syscall rows) are memoized,
+    so repeated identical profiles skip the heuristics entirely.
     """
-    def get(d: Optional[Dict[str, Any]], k: str):
-        return (d or {}).get(k)
+    sections = (timing, cpu, cache, memory, concurrency, syscalls)
+    frozen = tuple(_freeze(d) for d in sections)
+    if None in frozen:
+        return _classify(*sections)
+    res = _classify_cached(*frozen)
+    # Hand out copies so callers cannot mutate the cached entry
+    return {
+        **res,
+        "reasons": [dict(r) for r in res["reasons"]],
+        "suggestions": [(code, dict(args)) for code, args in res["suggestions"]],
+    }
 
-    elapsed = get(timing, "elapsed_s") or 0.0
-    wait_time = get(timing, "wait_time_s") or 0.0
-    wait_frac = (wait_time / elapsed) if elapsed else 0.0
 
-    ipc = get(cpu, "ipc")
-    branch_miss_rate = get(cpu, "branch_miss_rate_pct")
-    frontend_stall_pct = get(cpu, "frontend_stall_pct")
-    backend_stall_pct = get(cpu, "backend_stall_pct")
+def _classify(
+    timing: Dict[str, Any],
+    cpu: Dict[str, Any],
+    cache: Dict[str, Any],
+    memory: Dict[str, Any],
+    concurrency: Dict[str, Any],
+    syscalls: Dict[str, Any],
+) -> Dict[str, Any]:
+    timing = timing or {}
+    cpu = cpu or {}
+    cache = cache or {}
+    memory = memory or {}
+    concurrency = concurrency or {}
+    syscalls = syscalls or {}
 
-    l1d_miss_rate = get(cache, "l1d_miss_rate_pct")
-    llc_miss_rate = get(cache, "llc_miss_rate_pct")
+    elapsed = timing.get("elapsed_s") or 0.0
 
-    dtlb_miss_rate = get(memory, "dtlb_miss_rate_pct")
-    ram_total_bw = get(memory, "ram_total_bandwidth_mbps")
+    total = syscalls.get("total")
+    syscalls_total_seconds = total.get("seconds") if isinstance(total, dict) else None
+    rows = syscalls.get("syscalls")
+    if not isinstance(rows, list):
+        rows = []
 
-    syscalls_total_seconds = None
-    try:
-        total = (syscalls or {}).get("total")
-        if isinstance(total, dict):
-            syscalls_total_seconds = total.get("seconds")
-    except Exception:
-        syscalls_total_seconds = None
+    # Single pass over the syscall table: startup time, write totals and the
+    # first write row that dominates syscall time.
+    startup_time = 0.0
+    write_calls = 0
+    write_heavy_calls = None
+    for r in rows:
+        name = r.get("syscall")
+        if name in STARTUP_SYSCALLS:
+            startup_time += r.get("seconds", 0.0)
+        elif name == "write":
+            calls = r.get("calls", 0)
+            write_calls += calls
+            if write_heavy_calls is None and r.get("pct_time", 0) > WRITE_DOMINANT_PCT_TIME:
+                write_heavy_calls = calls
 
     # Detect short-lived / startup-dominated workload
     # Criteria: very short elapsed time AND syscalls dominated by execve/mmap (startup)
-    short_app = False
-    if elapsed and elapsed < 0.1:  # less than 100ms
-        # Check if top syscalls are startup-related
-        try:
-            rows = (syscalls or {}).get("syscalls", [])
-            if rows:
-                startup_syscalls = {"execve", "mmap", "munmap", "mprotect", "brk", "access", "openat", "close", "fstat", "read"}
-                startup_time = sum(r.get("seconds", 0.0) for r in rows if r.get("syscall") in startup_syscalls)
-                if syscalls_total_seconds and startup_time / syscalls_total_seconds > 0.7:
-                    short_app = True
-        except Exception:
-            pass
+    # Nothing else applies to such runs, so return before evaluating other heuristics.
+    if (elapsed and elapsed < SHORT_APP_ELAPSED_S  # less than 100ms
+            and rows and syscalls_total_seconds
+            and startup_time / syscalls_total_seconds > STARTUP_SYSCALL_FRAC):
+        return {
+            "primary_bottleneck": "No bottleneck",
+            "parallel_potential": "n/a",
+            "confidence": 0.9,  # High confidence for short apps
+            "reasons": [{
+                "elapsed_s": elapsed,
+                "note": "Short-lived app (< 100ms). Execution dominated by startup syscalls (execve/mmap). No meaningful steady-state bottleneck detected."
+            }],
+            "suggestions": [("short_app", {})],
+        }
+
+    wait_time = timing.get("wait_time_s") or 0.0
+    wait_frac = (wait_time / elapsed) if elapsed else 0.0
+    cpu_util_per_core = timing.get("cpu_utilization_per_core_pct") or 0.0
+
+    ipc = cpu.get("ipc")
+    branch_miss_rate = cpu.get("branch_miss_rate_pct")
+    frontend_stall_pct = cpu.get("frontend_stall_pct")
+    backend_stall_pct = cpu.get("backend_stall_pct")
+
+    l1d_miss_rate = cache.get("l1d_miss_rate_pct")
+    llc_miss_rate = cache.get("llc_miss_rate_pct")
+
+    dtlb_miss_rate = memory.get("dtlb_miss_rate_pct")
+    ram_total_bw = memory.get("ram_total_bandwidth_mbps")
+
+    threads = concurrency.get("threads") or 1
+    ctx_switches = concurrency.get("context_switches") or 0
 
     # Heuristics
-    io_cond = (wait_frac >= 0.2) or (elapsed and syscalls_total_seconds and (syscalls_total_seconds / elapsed) >= 0.3)
+    io_cond = (wait_frac >= IO_WAIT_FRAC) or (elapsed and syscalls_total_seconds and (syscalls_total_seconds / elapsed) >= IO_SYSCALL_FRAC)
     # Memory-bound heuristic
     # Primary signals: high miss rates (LLC, L1D, TLB). Backend stalls strengthen the case when available.
-    mem_miss_signals = 0
-    if llc_miss_rate is not None and llc_miss_rate >= 5.0:
-        mem_miss_signals += 1
-    if l1d_miss_rate is not None and l1d_miss_rate >= 10.0:
-        mem_miss_signals += 1
-    if dtlb_miss_rate is not None and dtlb_miss_rate >= 1.0:
-        mem_miss_signals += 1
+    mem_miss_signals = sum(v is not None and v >= t for v, t in (
+        (llc_miss_rate, LLC_MISS_HI),
+        (l1d_miss_rate, L1D_MISS_HI),
+        (dtlb_miss_rate, DTLB_MISS_HI),
+    ))
+    backend_stall_signal = backend_stall_pct is not None and backend_stall_pct >= STALL_PCT
+    high_bw = ram_total_bw is not None and ram_total_bw >= RAM_BW_HI_MBPS
 
     # Consider memory-bound if:
     # - We have stall data and it shows backend stalls with at least one miss signal, OR
@@ -73,216 +290,105 @@ def classify_performance(
     # - Total RAM bandwidth is very high (streaming), combined with at least one miss signal.
     mem_cond = False
     if backend_stall_pct is not None:
-        mem_cond = (mem_miss_signals >= 1) and (backend_stall_pct >= 20.0)
+        mem_cond = (mem_miss_signals >= 1) and backend_stall_signal
     else:
-        strong_miss = (llc_miss_rate is not None and llc_miss_rate >= 30.0) or (mem_miss_signals >= 2)
-        high_bw = (ram_total_bw is not None and ram_total_bw >= 1000.0)  # ~1 GB/s threshold
+        strong_miss = (llc_miss_rate is not None and llc_miss_rate >= LLC_MISS_STRONG) or (mem_miss_signals >= 2)
         mem_cond = strong_miss or (high_bw and mem_miss_signals >= 1)
 
-    branch_cond = (branch_miss_rate is not None and branch_miss_rate >= 5.0)
-    frontend_cond = (frontend_stall_pct is not None and frontend_stall_pct >= 30.0)
-    backend_cond = (backend_stall_pct is not None and backend_stall_pct >= 30.0)
-
-    # CPU compute-bound: decent IPC and low stalls/misses
-    cpu_compute_cond = (
-        (ipc is not None and ipc >= 1.5)
-        and (frontend_stall_pct is None or frontend_stall_pct < 20.0)
-        and (backend_stall_pct is None or backend_stall_pct < 20.0)
-        and (l1d_miss_rate is None or l1d_miss_rate < 10.0)
-        and (llc_miss_rate is None or llc_miss_rate < 5.0)
+    m = SimpleNamespace(
+        wait_frac=wait_frac,
+        syscalls_total_seconds=syscalls_total_seconds,
+        io_cond=io_cond,
+        mem_cond=mem_cond,
+        ipc=ipc,
+        threads=threads,
+        branch_miss_rate=branch_miss_rate,
+        frontend_stall_pct=frontend_stall_pct,
+        backend_stall_pct=backend_stall_pct,
+        l1d_miss_rate=l1d_miss_rate,
+        llc_miss_rate=llc_miss_rate,
+        dtlb_miss_rate=dtlb_miss_rate,
+        ram_total_bw=ram_total_bw,
     )
 
-    # Primary bottleneck selection
-    primary_bottleneck = "CPU"
-    reasons = []
-    
-    # Override: short-lived app gets "No bottleneck" classification
-    if short_app:
-        primary_bottleneck = "No bottleneck"
-        reasons.append({
-            "elapsed_s": elapsed,
-            "note": "Short-lived app (< 100ms). Execution dominated by startup syscalls (execve/mmap). No meaningful steady-state bottleneck detected."
-        })
-    elif io_cond:
-        primary_bottleneck = "I/O/Wait"
-        reasons.append({"io_wait_frac": round(wait_frac, 3), "syscalls_total_seconds": syscalls_total_seconds})
-    elif mem_cond:
-        primary_bottleneck = "Memory"
-        reasons.append({
-            "llc_miss_rate_pct": llc_miss_rate,
-            "l1d_miss_rate_pct": l1d_miss_rate,
-            "dtlb_miss_rate_pct": dtlb_miss_rate,
-            "backend_stall_pct": backend_stall_pct,
-            "ram_total_bandwidth_mbps": ram_total_bw
-        })
-    elif branch_cond:
-        primary_bottleneck = "CPU"
-        reasons.append({"branch_miss_rate_pct": branch_miss_rate})
-    elif frontend_cond or backend_cond:
-        primary_bottleneck = "CPU"
-        reasons.append({
-            "frontend_stall_pct": frontend_stall_pct,
-            "backend_stall_pct": backend_stall_pct
-        })
-    elif cpu_compute_cond:
-        primary_bottleneck = "CPU"
-        reasons.append({"ipc": ipc})
-    else:
-        # Default to CPU when nothing else dominates; add a small context reason
-        primary_bottleneck = "CPU"
-        reasons.append({
-            "ipc": ipc,
-            "frontend_stall_pct": frontend_stall_pct,
-            "backend_stall_pct": backend_stall_pct,
-            "branch_miss_rate_pct": branch_miss_rate
-        })
+    # Primary bottleneck selection: first matching rule wins
+    for primary_bottleneck, pred, reason in BOTTLENECK_RULES:
+        if pred(m):
+            reasons = [reason(m)]
+            break
 
     # Parallel potential heuristic
-    threads = get(concurrency, "threads") or 1
-    cpu_util_per_core = get(timing, "cpu_utilization_per_core_pct") or 0.0
-    if primary_bottleneck == "No bottleneck":
-        parallel_potential = "n/a"
-    elif primary_bottleneck == "Memory" or io_cond:
+    if primary_bottleneck == "Memory" or io_cond:
         parallel_potential = "low"
-    elif primary_bottleneck == "CPU" and threads <= 1 and (ipc or 0) >= 1.0:
+    elif primary_bottleneck == "CPU" and threads <= 1 and (ipc or 0) >= IPC_LOW:
         parallel_potential = "high"
-    elif primary_bottleneck == "CPU" and (ipc or 0) >= 0.9 and cpu_util_per_core < 85.0:
+    elif primary_bottleneck == "CPU" and (ipc or 0) >= IPC_PARALLEL_MEDIUM and cpu_util_per_core < CORE_UTIL_BUSY_PCT:
         parallel_potential = "medium"
     else:
         parallel_potential = "low"
 
     # Confidence score (rough): number of signals supporting the chosen bottleneck
     confidence = 0.5
-    if primary_bottleneck == "No bottleneck":
-        confidence = 0.9  # High confidence for short apps
-    elif primary_bottleneck == "Memory":
-        score = 0
-        if llc_miss_rate is not None and llc_miss_rate >= 5.0: score += 1
-        if l1d_miss_rate is not None and l1d_miss_rate >= 10.0: score += 1
-        if dtlb_miss_rate is not None and dtlb_miss_rate >= 1.0: score += 1
-        if backend_stall_pct is not None and backend_stall_pct >= 20.0: score += 1
-        if ram_total_bw is not None and ram_total_bw >= 1000.0: score += 1
+    if primary_bottleneck == "Memory":
+        score = mem_miss_signals + backend_stall_signal + high_bw
         confidence = 0.35 + 0.13 * min(score, 4)
     elif primary_bottleneck == "I/O/Wait":
         score = 0
-        if wait_frac >= 0.2: score += 1
-        if elapsed and syscalls_total_seconds and (syscalls_total_seconds / elapsed) >= 0.3: score += 1
+        if wait_frac >= IO_WAIT_FRAC: score += 1
+        if elapsed and syscalls_total_seconds and (syscalls_total_seconds / elapsed) >= IO_SYSCALL_FRAC: score += 1
         confidence = 0.4 + 0.3 * score
     else:  # CPU
         score = 0
-        if ipc is not None and ipc >= 1.5: score += 1
-        if frontend_stall_pct is not None and frontend_stall_pct < 20.0: score += 1
-        if backend_stall_pct is not None and backend_stall_pct < 20.0: score += 1
-        if l1d_miss_rate is not None and l1d_miss_rate < 10.0: score += 1
-        if llc_miss_rate is not None and llc_miss_rate < 5.0: score += 1
+        if ipc is not None and ipc >= IPC_COMPUTE: score += 1
+        if frontend_stall_pct is not None and frontend_stall_pct < STALL_PCT: score += 1
+        if backend_stall_pct is not None and backend_stall_pct < STALL_PCT: score += 1
+        if l1d_miss_rate is not None and l1d_miss_rate < L1D_MISS_HI: score += 1
+        if llc_miss_rate is not None and llc_miss_rate < LLC_MISS_HI: score += 1
         confidence = 0.3 + 0.15 * score
     # Enrich reasons to always be informative
-    try:
-        if primary_bottleneck == "I/O/Wait":
-            # Include top-3 syscalls by time if available
-            rows = (syscalls or {}).get("syscalls")
-            if isinstance(rows, list) and rows:
-                top = sorted(rows, key=lambda r: r.get("seconds", 0.0), reverse=True)[:3]
-                reasons.append({
-                    "top_syscalls_by_time": [
-                        {
-                            "syscall": r.get("syscall"),
-                            "seconds": r.get("seconds"),
-                            "pct_time": r.get("pct_time")
-                        } for r in top
-                    ]
-                })
-        # No extra summary for CPU/Memory to avoid redundancy with reasons above
-    except Exception:
-        pass
+    if primary_bottleneck == "I/O/Wait" and rows:
+        # Include top-3 syscalls by time if available
+        top = heapq.nlargest(3, rows, key=lambda r: r.get("seconds", 0.0))
+        reasons.append({
+            "top_syscalls_by_time": [
+                {
+                    "syscall": r.get("syscall"),
+                    "seconds": r.get("seconds"),
+                    "pct_time": r.get("pct_time")
+                } for r in top
+            ]
+        })
+    # No extra summary for CPU/Memory to avoid redundancy with reasons above
 
     # Generate actionable optimization suggestions based on bottleneck and metrics
     suggestions = []
     
-    if primary_bottleneck == "No bottleneck":
-        suggestions.append("Short-lived application (< 100ms runtime). Startup overhead dominates execution. No optimization opportunities for steady-state performance. If running many instances, consider batching or keeping process alive.")
-    
     # Detect potential profiling artifacts: high IPC + low syscall overhead but code likely does I/O
     # This happens when stdout is redirected during profiling, causing buffering
-    try:
-        rows = (syscalls or {}).get("syscalls", [])
-        write_calls = sum(r.get("calls", 0) for r in rows if r.get("syscall") == "write")
-        total_syscall_time = syscalls_total_seconds or 0
-        
-        if primary_bottleneck == "CPU" and write_calls > 0 and elapsed > 0:
-            # If writes exist but contributed very little time, output was likely buffered/redirected
-            if total_syscall_time / elapsed < 0.1 and write_calls > 100:
-                suggestions.append(f"Note: Profile shows CPU-bound with {write_calls} write calls but minimal I/O time. If this program writes to stdout, profiling with redirected output may have caused buffering that masks I/O bottlenecks. Re-run without redirection for accurate interactive performance.")
-    except Exception:
-        pass
+    total_syscall_time = syscalls_total_seconds or 0
+
+    if primary_bottleneck == "CPU" and write_calls > 0 and elapsed > 0:
+        # If writes exist but contributed very little time, output was likely buffered/redirected
+        if total_syscall_time / elapsed < BUFFERED_WRITE_SYSCALL_FRAC and write_calls > BUFFERED_WRITE_CALLS:
+            suggestions.append(("cpu.buffered_writes", {"write_calls": write_calls}))
     
     if primary_bottleneck == "I/O/Wait":
         # Check if dominated by write syscalls
-        write_heavy = False
-        try:
-            rows = (syscalls or {}).get("syscalls", [])
-            for r in rows:
-                if r.get("syscall") == "write" and r.get("pct_time", 0) > 90:
-                    write_heavy = True
-                    calls = r.get("calls", 0)
-                    if calls > 10000:
-                        suggestions.append("High write syscall count detected. Consider buffering output or using batch writes to reduce syscall overhead.")
-                    break
-        except Exception:
-            pass
+        write_heavy = write_heavy_calls is not None
+        if write_heavy and write_heavy_calls > WRITE_HEAVY_CALLS:
+            suggestions.append(("io.write_heavy", {}))
         
         if not write_heavy:
-            suggestions.append("I/O-bound workload detected. Consider async I/O, memory-mapped files, or reducing syscall frequency.")
+            suggestions.append(("io.generic", {}))
         
         # Check for frequent context switches
-        ctx_switches = get(concurrency, "context_switches") or 0
-        if elapsed and ctx_switches / elapsed > 100:
-            suggestions.append("High context switch rate. Consider reducing lock contention or thread count.")
+        if elapsed and ctx_switches / elapsed > CTX_SWITCH_HI_PER_S:
+            suggestions.append(("io.ctx_switches_high", {}))
     
-    elif primary_bottleneck == "Memory":
-        # High LLC miss rate
-        if llc_miss_rate is not None and llc_miss_rate >= 30.0:
-            suggestions.append(f"Very high LLC miss rate ({llc_miss_rate:.1f}%). Working set likely exceeds cache size. Consider reducing memory footprint, using cache-aware data structures, or blocking algorithms.")
-        elif llc_miss_rate is not None and llc_miss_rate >= 10.0:
-            suggestions.append(f"High LLC miss rate ({llc_miss_rate:.1f}%). Consider improving data locality (e.g., structure-of-arrays vs array-of-structures, prefetching).")
-        
-        # High L1D miss rate
-        if l1d_miss_rate is not None and l1d_miss_rate >= 15.0:
-            suggestions.append(f"High L1 data cache miss rate ({l1d_miss_rate:.1f}%). Consider improving spatial/temporal locality or reducing random access patterns.")
-        
-        # High TLB miss rate
-        if dtlb_miss_rate is not None and dtlb_miss_rate >= 2.0:
-            suggestions.append(f"High TLB miss rate ({dtlb_miss_rate:.1f}%). Large memory footprint with scattered access. Consider huge pages or reducing working set.")
-        
-        # High RAM bandwidth
-        if ram_total_bw is not None and ram_total_bw >= 5000.0:
-            suggestions.append(f"High RAM bandwidth usage ({ram_total_bw:.0f} MB/s). Memory-bandwidth bound. Consider compression, reducing data movement, or compute-to-memory-access ratio improvements.")
-    
-    elif primary_bottleneck == "CPU":
-        # Low IPC
-        if ipc is not None and ipc < 1.0:
-            suggestions.append(f"Low IPC ({ipc:.2f}). Pipeline inefficiency detected. Check for branch mispredictions, data dependencies, or inadequate instruction-level parallelism.")
-        
-        # High frontend stalls
-        if frontend_stall_pct is not None and frontend_stall_pct >= 30.0:
-            suggestions.append(f"High frontend stalls ({frontend_stall_pct:.1f}%). Instruction fetch bottleneck. Consider code layout optimization, reducing instruction cache misses, or removing excessive branches.")
-        
-        # High backend stalls
-        if backend_stall_pct is not None and backend_stall_pct >= 30.0:
-            suggestions.append(f"High backend stalls ({backend_stall_pct:.1f}%). Execution bottleneck. Check for long-latency operations, resource conflicts, or memory access patterns.")
-        
-        # High branch miss rate
-        if branch_miss_rate is not None and branch_miss_rate >= 5.0:
-            suggestions.append(f"High branch miss rate ({branch_miss_rate:.1f}%). Consider profile-guided optimization, reducing unpredictable branches, or using branchless code patterns.")
-        
-        # Good IPC and single-threaded
-        threads = get(concurrency, "threads") or 1
-        if ipc is not None and ipc >= 1.5 and threads == 1:
-            suggestions.append(f"Good IPC ({ipc:.2f}) with single-threaded execution. Consider parallelization to utilize multiple cores.")
-        
-        # Vectorization opportunity
-        if ipc is not None and ipc >= 1.0 and ipc < 2.0:
-            suggestions.append("Moderate IPC. Consider SIMD vectorization (AVX2/AVX-512) if working with arrays or loops with independent iterations.")
+    elif primary_bottleneck in SUGGESTION_RULES:
+        for pred, code, arg_names in SUGGESTION_RULES[primary_bottleneck]:
+            if pred(m):
+                suggestions.append((code, {k: getattr(m, k) for k in arg_names}))
 
     return {
         "primary_bottleneck": primary_bottleneck,
@@ -305,26 +411,33 @@ def classify_result(result: Dict[str, Any]) -> Dict[str, Any]:
 
 
 def main():
-    import argparse
-    p = argparse.ArgumentParser(description="Analyze profiler JSON and emit performance classification.")
-    p.add_argument("json", nargs="?", help="Path to profiler JSON file or '-' for stdin. If omitted, reads stdin.")
-    p.add_argument("--augment", action="store_true", help="Print original JSON with added 'performance_classification'.")
-    args = p.parse_args()
+    argv = sys.argv[1:]
+    if len(argv) <= 1 and not (argv and argv[0].startswith("-") and argv[0] != "-"):
+        # Fast path for filter-style use (`analyzer.py [file|-]`): skip argparse entirely
+        path, augment = (argv[0] if argv else None), False
+    else:
+        import argparse
+        p = argparse.ArgumentParser(description="Analyze profiler JSON and emit performance classification.")
+        p.add_argument("json", nargs="?", help="Path to profiler JSON file or '-' for stdin. If omitted, reads stdin.")
+        p.add_argument("--augment", action="store_true", help="Print original JSON with added 'performance_classification'.")
+        args = p.parse_args()
+        path, augment = args.json, args.augment
 
     # Read JSON
-    if not args.json or args.json == "-":
-        data = json.load(sys.stdin)
+    if not path or path == "-":
+        data = _loads(sys.stdin.buffer.read())
     else:
-        with open(args.json, "r") as f:
-            data = json.load(f)
+        with open(path, "rb") as f:
+            data = _loads(f.read())
 
     cls = classify_result(data)
-    if args.augment:
+    cls["suggestions"] = render_suggestions(cls["suggestions"])
+    if augment:
         data["performance_classification"] = cls
-        json.dump(data, sys.stdout, indent=2)
+        out = _dumps(data)
     else:
-        json.dump(cls, sys.stdout, indent=2)
-    print()
+        out = _dumps(cls)
+    sys.stdout.buffer.write(out + b"\n")
 
 if __name__ == "__main__":
     main()
@@ -1,258 +1,552 @@
 #!/usr/bin/env python3
 
 import argparse
+import contextlib
+import functools
 import subprocess
 import json
+import mmap
 import tempfile
 import os
+import platform
+import re
 import sys
 import shutil
+import struct
 import time
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
 from typing import Dict, Any
 
+try:
+    import orjson
+except ImportError:  # optional C-accelerated JSON; fall back to stdlib json
+    orjson = None
 
-def ensure_keys(dest: dict, defaults: dict) -> None:
-    """Ensure that each key from defaults exists in dest; set to default value when missing.
+
+def _loads(b) -> Any:
+    if orjson is not None:
+        return orjson.loads(b)
+    return json.loads(b)
+
+
+def _dumps(obj: Any) -> bytes:
+    # The two encoders agree on structure, indentation and values but not on float spelling
+    # (stdlib writes 1e-05, orjson 0.00001), so the output is equal as JSON, not byte-for-byte
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    return json.dumps(obj, indent=2).encode()
+
+
+def ensure_keys(dest: dict, keys) -> None:
+    """Ensure that each of `keys` exists in dest; missing keys are set to None.
 
     This makes the output schema stable: absent measurements become explicit None values.
     """
-    for k, v in defaults.items():
+    for k in keys:
         if k not in dest:
-            dest[k] = v
-
-def run_perf_stat(binary: str, args: list) -> Dict[str, Any]:
-    # Extended event list for comprehensive performance analysis
-    events = [
-        # Core timing and execution
-        "task-clock,instructions,cycles,ref-cycles",
-        # Branching
-        "branches,branch-misses",
-        # L1 Data Cache
-        "L1-dcache-loads,L1-dcache-load-misses,L1-dcache-stores",
-        # L1 Instruction Cache
-        "L1-icache-loads,L1-icache-load-misses",
-        # Last Level Cache (LLC/L3)
-        "LLC-loads,LLC-load-misses,LLC-stores,LLC-store-misses",
-        # TLB (Translation Lookaside Buffer)
-        "dTLB-loads,dTLB-load-misses,iTLB-loads,iTLB-load-misses",
-        # Pipeline stalls
-        "stalled-cycles-frontend,stalled-cycles-backend",
-        # System events
-        "context-switches,cpu-migrations,page-faults,minor-faults,major-faults",
-        # Alignment and other faults
-        "alignment-faults,emulation-faults",
-    ]
-    
-    cmd = ["perf", "stat", "-e", ",".join(events), binary] + args
-    with tempfile.NamedTemporaryFile(delete=False, mode="w+") as tmp:
-        try:
-            result = subprocess.run(cmd, stdout=tmp, stderr=subprocess.STDOUT, text=True)
-            tmp.flush()
-            tmp.seek(0)
-            output = tmp.read()
-        finally:
-            os.unlink(tmp.name)
-    
-    metrics = {}
-    for line in output.splitlines():
-        parts = line.split()
-        if len(parts) < 2:
+            dest[k] = None
+
+# Events requested from perf stat, as (perf event name, metric key)
+PERF_EVENTS = (
+    # Core timing and execution
+    ("task-clock", "task_clock_ms"),
+    ("duration_time", "elapsed_s"),
+    ("instructions", "instructions"),
+    ("cycles", "cycles"),
+    ("ref-cycles", "ref_cycles"),
+    # Branching
+    ("branches", "branches"),
+    ("branch-misses", "branch_misses"),
+    # L1 Data Cache
+    ("L1-dcache-loads", "l1_dcache_loads"),
+    ("L1-dcache-load-misses", "l1_dcache_load_misses"),
+    ("L1-dcache-stores", "l1_dcache_stores"),
+    # L1 Instruction Cache
+    ("L1-icache-loads", "l1_icache_loads"),
+    ("L1-icache-load-misses", "l1_icache_load_misses"),
+    # Last Level Cache (LLC/L3)
+    ("LLC-loads", "llc_loads"),
+    ("LLC-load-misses", "llc_load_misses"),
+    ("LLC-stores", "llc_stores"),
+    ("LLC-store-misses", "llc_store_misses"),
+    # TLB (Translation Lookaside Buffer)
+    ("dTLB-loads", "dtlb_loads"),
+    ("dTLB-load-misses", "dtlb_load_misses"),
+    ("iTLB-loads", "itlb_loads"),
+    ("iTLB-load-misses", "itlb_load_misses"),
+    # Pipeline stalls
+    ("stalled-cycles-frontend", "stalled_cycles_frontend"),
+    ("stalled-cycles-backend", "stalled_cycles_backend"),
+    # System events
+    ("context-switches", "context_switches"),
+    ("cpu-migrations", "cpu_migrations"),
+    ("page-faults", "page_faults"),
+    ("minor-faults", "minor_faults"),
+    ("major-faults", "major_faults"),
+    # Alignment and other faults
+    ("alignment-faults", "alignment_faults"),
+    ("emulation-faults", "emulation_faults"),
+)
+# Events whose ratios we report (ipc, miss rates) are scheduled as perf groups so that,
+# if perf has to multiplex counters, each pair is counted over the same intervals.
+# Groups stay at two events (well under the usual 4+ general-purpose counters) and
+# only pair events that are broadly supported: a group with an unsupported member
+# is not counted at all.
+PERF_EVENT_GROUPS = (
+    ("instructions", "cycles"),
+    ("branches", "branch-misses"),
+    ("L1-dcache-loads", "L1-dcache-load-misses"),
+)
+
+def _perf_event_list() -> str:
+    """Build the `perf stat -e` argument from PERF_EVENTS, wrapping PERF_EVENT_GROUPS in {}."""
+    group_of = {name: group for group in PERF_EVENT_GROUPS for name in group}
+    out, emitted = [], set()
+    for name, _ in PERF_EVENTS:
+        group = group_of.get(name)
+        if group is None:
+            out.append(name)
+        elif group not in emitted:
+            emitted.add(group)
+            out.append("{" + ",".join(group) + "}")
+    return ",".join(out)
+
+PERF_EVENT_LIST = _perf_event_list()
+
+# perf "tool" events with the target's own rusage (ns), as (perf event name, metric key).
+# Older perf rejects the whole event list on an unknown name, so they are only requested
+# from PERF_RUSAGE_MIN_VERSION on.
+PERF_RUSAGE_EVENTS = (
+    ("user_time", "user_s"),
+    ("system_time", "sys_s"),
+)
+PERF_RUSAGE_MIN_VERSION = (5, 18)
+
+# perf event name (as requested, plus lowercase) -> metric key.
+# Some PMUs echo the L1 events under their raw replacement names.
+PERF_EVENT_KEYS = {name: key for name, key in PERF_EVENTS}
+PERF_EVENT_KEYS.update({name.lower(): key for name, key in PERF_EVENTS})
+PERF_EVENT_KEYS.update(PERF_RUSAGE_EVENTS)
+PERF_EVENT_KEYS.update({
+    "l1d.replacement": "l1_dcache_loads",
+    "l1i.replacement": "l1_icache_loads",
+    "l1i.replacements": "l1_icache_loads",
+})
+
+# `perf stat -x,` line: value,unit,event,run-time,pct,... -> (value, event, pct).
+# The event group drops hybrid PMU prefixes (cpu_core/cycles/) and modifiers (cycles:u).
+PERF_EVENT_NAME_RE = re.compile(r"(?:[\w.-]+/)?([^,:/\s]+)")
+PERF_CSV_LINE_RE = re.compile(r"([^,]*),[^,]*,(?:[\w.-]+/)?([^,:/\s]+)[^,]*(?:,[^,]*,([^,]*))?")
+
+# First perf release whose `perf stat -j` emits one JSON object per event line
+PERF_JSON_MIN_VERSION = (6, 2)
+
+# Unit conversions applied after lookup: metric key -> divisor from perf's native unit.
+# Dividing by an exact 1e9 keeps "13000000 ns" at 0.013 s; multiplying by the inexact
+# 1e-9 would leave float noise such as 0.013000000000000001.
+PERF_EVENT_DIVISOR = {
+    "elapsed_s": 1e9,  # duration_time is reported in ns
+    "user_s": 1e9,     # user_time / system_time are reported in ns
+    "sys_s": 1e9,
+}
+
+# (perf metric key, output key) pairs copied verbatim into each result section;
+# derived metrics (ipc, rates, bandwidth) are computed explicitly in main()
+_TIMING_KEYS = (
+    ("elapsed_s", "elapsed_s"),
+    ("user_s", "user_s"),
+    ("sys_s", "sys_s"),
+    ("wait_time_s", "wait_time_s"),
+    ("task_clock_ms", "task_clock_ms"),
+)
+_CPU_KEYS = (
+    ("instructions", "instructions"),
+    ("cycles", "cycles"),
+    ("ref_cycles", "ref_cycles"),
+    ("stalled_cycles_frontend", "stalled_cycles_frontend"),
+    ("stalled_cycles_backend", "stalled_cycles_backend"),
+    ("branches", "branches"),
+    ("branch_misses", "branch_misses"),
+)
+_CACHE_KEYS = (
+    ("l1_dcache_loads", "l1d_loads"),
+    ("l1_dcache_load_misses", "l1d_load_misses"),
+    ("l1_dcache_stores", "l1d_stores"),
+    ("l1_icache_loads", "l1i_loads"),
+    ("l1_icache_load_misses", "l1i_load_misses"),
+    ("llc_loads", "llc_loads"),
+    ("llc_load_misses", "llc_load_misses"),
+    ("llc_stores", "llc_stores"),
+    ("llc_store_misses", "llc_store_misses"),
+)
+_SCHED_KEYS = (
+    ("context_switches", "context_switches"),
+    ("cpu_migrations", "cpu_migrations"),
+)
+_MEM_KEYS = (
+    ("dtlb_loads", "dtlb_loads"),
+    ("dtlb_load_misses", "dtlb_load_misses"),
+    ("itlb_loads", "itlb_loads"),
+    ("itlb_load_misses", "itlb_load_misses"),
+    ("page_faults", "page_faults"),
+    ("minor_faults", "minor_faults"),
+    ("major_faults", "major_faults"),
+    ("alignment_faults", "alignment_faults"),
+    ("emulation_faults", "emulation_faults"),
+)
+# (output key, numerator key, denominator key, scale, rounding digits) for cpu ratios
+_CPU_RATIOS = (
+    ("ipc", "instructions", "cycles", 1.0, 6),
+    ("frequency_ratio", "cycles", "ref_cycles", 1.0, 6),
+    ("frontend_stall_pct", "stalled_cycles_frontend", "cycles", 100.0, 3),
+    ("backend_stall_pct", "stalled_cycles_backend", "cycles", 100.0, 3),
+    ("branch_miss_rate_pct", "branch_misses", "branches", 100.0, 6),
+)
+
+def _ratio(num, den, scale: float = 100.0, digits: int = 6):
+    """scale * num / den rounded to `digits`, or None when num is missing or den is 0/missing."""
+    if num is None or not den:
+        return None
+    return round(scale * num / den, digits)
+
+# (output key, perf misses key, perf loads key) for derived miss rates
+_CACHE_MISS_RATES = (
+    ("l1d_miss_rate_pct", "l1_dcache_load_misses", "l1_dcache_loads"),
+    ("l1i_miss_rate_pct", "l1_icache_load_misses", "l1_icache_loads"),
+    ("llc_miss_rate_pct", "llc_load_misses", "llc_loads"),
+)
+_TLB_MISS_RATES = (
+    ("dtlb_miss_rate_pct", "dtlb_load_misses", "dtlb_loads"),
+    ("itlb_miss_rate_pct", "itlb_load_misses", "itlb_loads"),
+)
+
+def _miss_rate_pct(misses, loads):
+    """Miss rate in percent (capped at 100), or None unless both counts are non-zero."""
+    if not (loads and misses):
+        return None
+    return round(min(100.0 * misses / max(1, loads), 100.0), 6)
+
+# Bandwidth estimates count one cache line per miss/access
+CACHE_LINE_BYTES = 64
+
+# (output key prefix, perf counters summed) for the RAM traffic fields
+_RAM_TRAFFIC = (
+    ("ram_read", frozenset({"llc_load_misses"})),
+    ("ram_write", frozenset({"llc_store_misses"})),
+    ("ram_total", frozenset({"llc_load_misses", "llc_store_misses"})),
+)
+
+_INV_MB = 1.0 / (1024 * 1024)
+
+def _mb_and_mbps(nbytes: int, inv_mbps: float):
+    """Return (MiB, MiB/s) for `nbytes`, each rounded to 3 places; inv_mbps is _INV_MB / elapsed."""
+    return round(nbytes * _INV_MB, 3), round(nbytes * inv_mbps, 3)
+
+# perf-derived fields that open the "memory" section, in output order
+MEMORY_ACCESS_FIELDS = (
+    # TLB
+    "dtlb_loads", "dtlb_load_misses", "dtlb_miss_rate_pct",
+    "itlb_loads", "itlb_load_misses", "itlb_miss_rate_pct",
+    # Page faults
+    "page_faults", "minor_faults", "major_faults",
+    # Fault types
+    "alignment_faults", "emulation_faults",
+    # RAM bandwidth (from LLC misses)
+    "ram_read_bytes", "ram_read_mb", "ram_read_bandwidth_mbps",
+    "ram_write_bytes", "ram_write_mb", "ram_write_bandwidth_mbps",
+    "ram_total_bytes", "ram_total_mb", "ram_total_bandwidth_mbps",
+    "ram_read_pct", "ram_write_pct",
+    # L1 cache traffic
+    "l1_cache_traffic_mb", "l1_cache_bandwidth_mbps",
+)
+
+# Output schema: every key of each section is always emitted, None when not measured
+TIMING_FIELDS = (
+    "elapsed_s", "user_s", "sys_s", "wait_time_s", "task_clock_ms",
+    "cpu_utilization_pct", "cpu_utilization_per_core_pct",
+)
+CPU_FIELDS = (
+    "instructions", "cycles", "ref_cycles", "ipc", "frequency_ratio",
+    "stalled_cycles_frontend", "frontend_stall_pct",
+    "stalled_cycles_backend", "backend_stall_pct",
+    "branches", "branch_misses", "branch_miss_rate_pct",
+    "instructions_per_second", "note",
+)
+CACHE_FIELDS = (
+    "l1d_loads", "l1d_load_misses", "l1d_stores", "l1d_miss_rate_pct",
+    "l1i_loads", "l1i_load_misses", "l1i_miss_rate_pct",
+    "llc_loads", "llc_load_misses", "llc_stores", "llc_store_misses", "llc_miss_rate_pct",
+)
+CONCURRENCY_FIELDS = (
+    "context_switches", "cpu_migrations", "ctx_switches_per_second", "migrations_per_second",
+    "threads", "pinned_cpu", "available_cpus",
+)
+MEMORY_FIELDS = MEMORY_ACCESS_FIELDS + (
+    # Max RSS
+    "max_rss_kb",
+    # Massif peaks
+    "massif_peak_heap_bytes", "massif_peak_heap_extra_bytes", "massif_peak_total_bytes",
+    "massif_peak_stacks_bytes", "massif_peak_time", "massif_peak_snapshot",
+    # Memcheck
+    "memcheck",
+    # --hugepages comparison
+    "hugepages",
+)
+FOOTPRINT_FIELDS = ("unstripped_bytes", "stripped_bytes", "sections")
+
+@contextlib.contextmanager
+def _popen_with_report_fd(cmd_for_fd, env=None):
+    """Start a tool with a private pipe for its report; yield (proc, report lines).
+
+    `cmd_for_fd(fd)` builds the command line given the pipe's write end (e.g. --log-fd=N or
+    -o /dev/fd/N). The target's own stdout/stderr go to DEVNULL, so nothing it prints can
+    be mistaken for report lines, and undecodable bytes in the report are replaced.
+    """
+    r, w = os.pipe()
+    try:
+        proc = subprocess.Popen(cmd_for_fd(w), pass_fds=(w,), env=env,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    except BaseException:
+        os.close(r)
+        raise
+    finally:
+        # The child holds its own copy; closing ours lets the reader see EOF
+        os.close(w)
+    with proc, open(r, "r", errors="replace") as report:
+        yield proc, report
+
+def _perf_csv_records(lines):
+    """Yield (value, event, pct) from `perf stat -x,` lines."""
+    match = PERF_CSV_LINE_RE.match
+    for line in lines:
+        m = match(line)
+        if m is not None:
+            yield m.groups()
+
+def _perf_json_records(lines):
+    """Yield (value, event, pct) from `perf stat -j` lines (one JSON object per event)."""
+    match = PERF_EVENT_NAME_RE.match
+    for line in lines:
+        if not line.startswith("{"):
             continue
-        
         try:
-            value_str = parts[0].replace(",", "").replace("<not", "").replace("supported>", "").strip()
-            if not value_str or value_str == "":
-                continue
-            value = float(value_str) if "." in value_str else int(value_str)
-        except (ValueError, IndexError):
+            obj = _loads(line)
+        except ValueError:
             continue
-        
-        line_lower = line.lower()
-        
-        # Timing
-        if "task-clock" in line_lower:
-            # perf prints like: <val> msec task-clock
+        m = match(obj.get("event", ""))
+        if m is None:
+            continue
+        raw = obj.get("counter-value", "")
+        # counter-value is printed with %f; trim "123.000000" back to "123" so counts stay ints
+        if "." in raw:
+            raw = raw.rstrip("0").rstrip(".")
+        yield raw, m.group(1), obj.get("pcnt-running")
+
+def run_perf_stat(binary: str, args: list, env=None, json_output: bool = False,
+                  rusage_events: bool = False) -> Dict[str, Any]:
+    # JSON output (-j) is one self-describing object per event; CSV output (-x,) is one
+    # "value,unit,event,run-time,pct,metric,metric-unit" line per event for older perf.
+    # Neither has the user/sys summary of the default output; rusage_events requests it as
+    # the user_time/system_time tool events, which cover the target only (not perf itself).
+    fmt = ["-j"] if json_output else ["-x", ","]
+    events = PERF_EVENT_LIST
+    if rusage_events:
+        events += "," + ",".join(name for name, _ in PERF_RUSAGE_EVENTS)
+    records = _perf_json_records if json_output else _perf_csv_records
+    metrics = {}
+    multiplexed = {}
+    keys = PERF_EVENT_KEYS
+    # perf stat reports on --log-fd; parse lines as they arrive instead of buffering the whole report
+    with _popen_with_report_fd(lambda fd: ["perf", "stat", *fmt, "--log-fd", str(fd),
+                                           "-e", events, binary, *args], env=env) as (proc, report):
+        for raw, event, pct in records(report):
+            # perf echoes event names as requested, so the exact spelling almost always hits;
+            # only fall back to a lowercase probe for PMU-renamed events
+            key = keys.get(event) or keys.get(event.lower())
+            if key is None or raw.startswith("<"):
+                continue  # unknown event, or <not supported> / <not counted>
             try:
-                metrics["task_clock_ms"] = float(parts[0].replace(",", ""))
-            except Exception:
-                pass
-        elif "seconds time elapsed" in line_lower:
-            metrics["elapsed_s"] = float(parts[0])
-        elif "seconds user" in line_lower:
-            metrics["user_s"] = float(parts[0])
-        elif "seconds sys" in line_lower:
-            metrics["sys_s"] = float(parts[0])
-        
-        # Core execution
-        elif "instructions" in line_lower:
-            metrics["instructions"] = value
-        elif "ref-cycles" in line_lower or "reference cycles" in line_lower:
-            metrics["ref_cycles"] = value
-        elif "cycles" in line_lower and "ref-cycles" not in line_lower:
-            metrics["cycles"] = value
-        
-        # Branching
-        elif "branch-misses" in line_lower:
-            metrics["branch_misses"] = value
-        elif "branches" in line_lower:
-            metrics["branches"] = value
-        
-        # L1 Data Cache
-        elif "l1-dcache-loads" in line_lower or "l1d.replacement" in line_lower:
-            metrics["l1_dcache_loads"] = value
-        elif "l1-dcache-load-misses" in line_lower:
-            metrics["l1_dcache_load_misses"] = value
-        elif "l1-dcache-stores" in line_lower:
-            metrics["l1_dcache_stores"] = value
-        
-        # L1 Instruction Cache
-        elif "l1-icache-loads" in line_lower or "l1i.replacements" in line_lower or "l1i.replacement" in line_lower:
-            metrics["l1_icache_loads"] = value
-        elif "l1-icache-load-misses" in line_lower:
-            metrics["l1_icache_load_misses"] = value
-        
-        # LLC (L3)
-        elif "llc-loads" in line_lower:
-            metrics["llc_loads"] = value
-        elif "llc-load-misses" in line_lower:
-            metrics["llc_load_misses"] = value
-        elif "llc-stores" in line_lower:
-            metrics["llc_stores"] = value
-        elif "llc-store-misses" in line_lower:
-            metrics["llc_store_misses"] = value
-        
-        # TLB
-        elif "dtlb-loads" in line_lower or "dtlb-loads" in line:
-            metrics["dtlb_loads"] = value
-        elif "dtlb-load-misses" in line_lower:
-            metrics["dtlb_load_misses"] = value
-        elif "itlb-loads" in line_lower:
-            metrics["itlb_loads"] = value
-        elif "itlb-load-misses" in line_lower:
-            metrics["itlb_load_misses"] = value
-        
-        # Stalls
-        elif "stalled-cycles-frontend" in line_lower:
-            metrics["stalled_cycles_frontend"] = value
-        elif "stalled-cycles-backend" in line_lower:
-            metrics["stalled_cycles_backend"] = value
-        
-        # System
-        elif "context-switches" in line_lower:
-            metrics["context_switches"] = value
-        elif "cpu-migrations" in line_lower:
-            metrics["cpu_migrations"] = value
-        elif "page-faults" in line_lower and "major" not in line_lower and "minor" not in line_lower:
-            metrics["page_faults"] = value
-        elif "minor-faults" in line_lower:
-            metrics["minor_faults"] = value
-        elif "major-faults" in line_lower:
-            metrics["major_faults"] = value
-        
-        # Faults
-        elif "alignment-faults" in line_lower:
-            metrics["alignment_faults"] = value
-        elif "emulation-faults" in line_lower:
-            metrics["emulation_faults"] = value
+                value = float(raw) if "." in raw else int(raw)
+            except ValueError:
+                continue
+            if key in PERF_EVENT_DIVISOR:
+                value = value / PERF_EVENT_DIVISOR[key]
+            # Hybrid CPUs report one line per PMU; accumulate them
+            metrics[key] = metrics.get(key, 0) + value
+            # pct is the share of run time the counter was scheduled; <100 means perf
+            # multiplexed it and scaled the count up from a sample
+            try:
+                pct = float(pct)
+            except (TypeError, ValueError):
+                continue
+            if pct < 100.0:
+                multiplexed[event] = min(pct, multiplexed.get(event, 100.0))
+    # Wall time the target spent off-CPU, from the same run's target-only task-clock
+    if "elapsed_s" in metrics and "task_clock_ms" in metrics:
+        metrics["wait_time_s"] = round(max(0.0, metrics["elapsed_s"] - metrics["task_clock_ms"] / 1000.0), 6)
     
+    if multiplexed:
+        metrics["multiplexed_pct"] = multiplexed
     return metrics
 
+# --hugepages mode -> glibc malloc tunable. glibc >= 2.35 then backs the heap with
+# transparent huge pages (madvise) or hugetlbfs pages, with no root or preload shim.
+HUGEPAGE_TUNABLES = {
+    "madvise": "glibc.malloc.hugetlb=1",
+    "hugetlb": "glibc.malloc.hugetlb=2",
+}
+
+def _read_thp_mode():
+    """Return the active THP mode (always/madvise/never), or None if unavailable."""
+    try:
+        with open("/sys/kernel/mm/transparent_hugepage/enabled", "r") as f:
+            m = re.search(r"\[(\w+)\]", f.read())
+    except OSError:
+        return None
+    return m.group(1) if m else None
+
+def _pct_delta(new, base):
+    if new is None or not base:
+        return None
+    return round(100.0 * (new - base) / base, 3)
+
+def run_perf_stat_hugepages(binary: str, args: list, mode: str, baseline: Dict[str, Any],
+                            json_output: bool = False) -> Dict[str, Any]:
+    """Re-run perf stat with a huge-page-backed heap and report TLB/cycle deltas vs `baseline`."""
+    env = dict(os.environ)
+    tunable = HUGEPAGE_TUNABLES[mode]
+    env["GLIBC_TUNABLES"] = f"{env['GLIBC_TUNABLES']}:{tunable}" if env.get("GLIBC_TUNABLES") else tunable
+    hp = run_perf_stat(binary, args, env=env, json_output=json_output)
+    res: Dict[str, Any] = {"mode": mode, "thp_enabled": _read_thp_mode()}
+    for key in ("dtlb_load_misses", "itlb_load_misses", "cycles"):
+        res[key] = hp.get(key)
+        res[f"{key}_delta_pct"] = _pct_delta(hp.get(key), baseline.get(key))
+    res["dtlb_miss_rate_pct"] = _miss_rate_pct(hp.get("dtlb_load_misses"), hp.get("dtlb_loads"))
+    return res
+
+# Seconds per field of a [[h:]m:]s clock value, least significant first
+_CLOCK_MULTIPLIERS = (1.0, 60.0, 3600.0)
+
+def _clock_to_seconds(s: str) -> float:
+    """Convert "s", "m:ss" or "h:mm:ss" (fractional seconds allowed) to seconds."""
+    return sum(float(p) * m for p, m in zip(reversed(s.strip().split(":")), _CLOCK_MULTIPLIERS))
+
+# GNU time (not the shell builtin); resolved once at import since it does not move
+_TIME_BIN = "/usr/bin/time" if os.path.exists("/usr/bin/time") else None
+
+# `time -v` report lines we keep: label -> (timing key, value parser).
+# The elapsed value is "h:mm:ss" or "m:ss", so the match splits after the full label.
+TIME_V_FIELDS = {
+    "User time (seconds)": ("user_s", float),
+    "System time (seconds)": ("sys_s", float),
+    "Elapsed (wall clock) time (h:mm:ss or m:ss)": ("elapsed_s", _clock_to_seconds),
+    "Maximum resident set size (kbytes)": ("max_rss_kb", int),
+}
+TIME_V_LINE_RE = re.compile(r"\s*(" + "|".join(map(re.escape, TIME_V_FIELDS)) + r"):\s*(\S+)")
+
 def run_time_v_timing(binary: str, args: list) -> Dict[str, Any]:
-    """Run /usr/bin/time -v and parse elapsed, user, sys seconds.
-    Returns keys: elapsed_s, user_s, sys_s, wait_time_s (when derivable).
+    """Run /usr/bin/time -v once and parse elapsed, user, sys seconds and Max RSS.
+    Returns keys: elapsed_s, user_s, sys_s, wait_time_s (when derivable), max_rss_kb.
     """
-    time_path = "/usr/bin/time"
-    if not os.path.exists(time_path):
+    if _TIME_BIN is None:
         return {}
-    tmp = tempfile.NamedTemporaryFile(delete=False, mode="w+")
-    tmp.close()
-    try:
-        cmd = [time_path, "-v", "-o", tmp.name, binary, *args]
-        subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        timing: Dict[str, Any] = {}
+    timing: Dict[str, Any] = {}
+    match = TIME_V_LINE_RE.match
 
-        def parse_elapsed_to_seconds(s: str):
+    # time -v writes its report after the target exits; parse it straight off the pipe
+    with _popen_with_report_fd(lambda fd: [_TIME_BIN, "-o", f"/dev/fd/{fd}", "-v", binary, *args]) as (_, report):
+        for line in report:
+            m = match(line)
+            if m is None:
+                continue
+            key, conv = TIME_V_FIELDS[m.group(1)]
             try:
-                s = s.strip()
-                if ":" not in s:
-                    return float(s)
-                parts = [p.strip() for p in s.split(":")]
-                secs = float(parts[-1])
-                mins = int(parts[-2]) if len(parts) >= 2 else 0
-                hrs = int(parts[-3]) if len(parts) >= 3 else 0
-                return hrs * 3600.0 + mins * 60.0 + secs
-            except Exception:
-                return None
+                timing[key] = conv(m.group(2))
+            except ValueError:
+                pass
+    # Derive wait time
+    if all(k in timing for k in ("elapsed_s", "user_s", "sys_s")):
+        timing["wait_time_s"] = max(0.0, timing["elapsed_s"] - (timing["user_s"] + timing["sys_s"]))
+    return timing
 
-        with open(tmp.name, "r") as f:
-            for line in f:
-                ls = line.strip()
-                if ls.startswith("User time (seconds):"):
-                    try:
-                        timing["user_s"] = float(ls.split(":", 1)[1].strip())
-                    except Exception:
-                        pass
-                elif ls.startswith("System time (seconds):"):
-                    try:
-                        timing["sys_s"] = float(ls.split(":", 1)[1].strip())
-                    except Exception:
-                        pass
-                elif ls.startswith("Elapsed (wall clock) time"):
-                    # Use rsplit to avoid splitting inside "h:mm:ss" text
-                    val = ls.rsplit(":", 1)[1].strip()
-                    ev = parse_elapsed_to_seconds(val)
-                    if ev is not None:
-                        timing["elapsed_s"] = ev
-        # Derive wait time
-        if all(k in timing for k in ("elapsed_s", "user_s", "sys_s")):
-            timing["wait_time_s"] = max(0.0, timing["elapsed_s"] - (timing["user_s"] + timing["sys_s"]))
-        return timing
-    finally:
-        try:
-            os.unlink(tmp.name)
-        except Exception:
-            pass
+# Parent of the per-run scratch directory made in main(). Tool output files are written
+# once and read straight back, so keep them on tmpfs when available
+SCRATCH_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+# Summary column order requested from strace builds with -U/--summary-columns. Putting
+# errors last removes the "is the next token the errors count?" guess of the default layout.
+STRACE_SUMMARY_COLUMNS = "name,calls,total-time,avg-time,time-percent,errors"
 
-def run_strace_summary(binary: str, args: list) -> Dict[str, Any]:
+def run_strace_summary(binary: str, args: list, tdir: str, fixed_columns: bool = False) -> Dict[str, Any]:
     """Run strace -f -c and parse syscall summary into structured JSON.
+    The report is written to a file in `tdir`, the per-run scratch directory.
+    fixed_columns requests the STRACE_SUMMARY_COLUMNS layout (strace with -U support).
     Returns { syscalls: [...], total: {...} } or { raw: "..." } on parse issues.
     """
-    tmp = tempfile.NamedTemporaryFile(delete=False)
-    tmp.close()
+    columns = ["-U", STRACE_SUMMARY_COLUMNS] if fixed_columns else []
+    path = os.path.join(tdir, "strace.txt")
+    subprocess.run(["strace", "-f", "-c", *columns, "-o", path, binary, *args],
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    if not os.path.exists(path):
+        return {"raw": ""}
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return {"raw": ""}
+        # Map the report and scan it as bytes; text is only decoded for names and the raw fallback
+        with mmap.mmap(f.fileno(), 0, prot=mmap.PROT_READ) as mm:
+            return _parse_strace_summary(iter(mm.readline, b""),
+                                         lambda: mm[:].decode(errors="replace").rstrip("\n"),
+                                         fixed_columns)
+
+# Per-syscall row layout, in output key order
+STRACE_ROW_FIELDS = ("syscall", "calls", "errors", "seconds", "usecs_per_call", "pct_time")
+
+def _safe_float(s: bytes) -> float:
     try:
-        subprocess.run(["strace", "-f", "-c", "-o", tmp.name, binary, *args],
-                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        with open(tmp.name, "r") as f:
-            raw_lines = [ln.rstrip("\n") for ln in f]
-        # Strip empties for easier parsing, but keep original for raw fallback
-        lines = [ln for ln in raw_lines if ln.strip()]
-        header_idx = next((i for i, l in enumerate(lines) if "syscall" in l.lower()), None)
-        if header_idx is None:
-            return {"raw": "\n".join(raw_lines)}
-        rows = []
-        total = {}
-
-        def safe_float(s: str) -> float:
-            try:
-                return float(s)
-            except Exception:
-                return 0.0
+        return float(s)
+    except ValueError:
+        return 0.0
 
-        def safe_int(s: str) -> int:
-            try:
-                return int(s)
-            except Exception:
-                return 0
-
-        for l in lines[header_idx + 1:]:
-            ls = l.strip()
-            lo = ls.lower()
-            if set(ls) <= {"-", " "}:  # separator line of dashes
-                continue
-            parts = ls.split()
-            if len(parts) < 5:
-                continue
-            # Layout: %time seconds usecs/call calls [errors] syscall
+def _safe_int(s: bytes) -> int:
+    try:
+        return int(s)
+    except ValueError:
+        return 0
+
+def _parse_strace_summary(lines, raw, fixed_columns: bool = False) -> Dict[str, Any]:
+    """Parse `strace -c` summary lines (bytes). `raw()` returns the full text for the fallback.
+    fixed_columns selects the STRACE_SUMMARY_COLUMNS layout requested via -U.
+    """
+    safe_float, safe_int = _safe_float, _safe_int
+
+    # Skip everything up to and including the header line
+    for l in lines:
+        if b"syscall" in l.lower():
+            break
+    else:
+        return {"raw": raw()}
+
+    rows = []
+    total = {}
+    for l in lines:
+        if not l.strip(b"- \t\r\n"):  # blank or separator line of dashes
+            continue
+        # split() already drops surrounding whitespace, so no separate strip() copy
+        parts = l.split()
+        if len(parts) < 5:
+            continue
+        if fixed_columns:
+            # Layout (STRACE_SUMMARY_COLUMNS): syscall calls seconds usecs/call %time [errors].
+            # errors is last, so a blank (zero) errors cell simply shortens the row.
+            syscall = parts[0].decode(errors="replace")
+            calls = safe_int(parts[1])
+            seconds = safe_float(parts[2])
+            usecs_per_call = safe_float(parts[3])
+            pct_time = safe_float(parts[4])
+            errors = safe_int(parts[5]) if len(parts) > 5 else 0
+        else:
+            # Default layout: %time seconds usecs/call calls [errors] syscall
             pct_time = safe_float(parts[0])
             seconds = safe_float(parts[1])
             usecs_per_call = safe_float(parts[2])
@@ -262,282 +556,313 @@ def run_strace_summary(binary: str, args: list) -> Dict[str, Any]:
             errors = 0
             if idx < len(parts) and parts[idx].isdigit():
                 errors = safe_int(parts[idx]); idx += 1
-            syscall = " ".join(parts[idx:]) if idx < len(parts) else ""
-            # Handle the 'total' summary row which appears with 'total' as syscall name in some versions
-            if syscall.lower() == "total":
-                total = {
-                    "pct_time": pct_time if pct_time else 100.0,
-                    "seconds": seconds,
-                    "usecs_per_call": usecs_per_call,
-                    "calls": calls,
-                    "errors": errors,
-                }
-                continue
-            if not syscall:
-                continue
-            rows.append({
-                "syscall": syscall,
-                "calls": calls,
-                "errors": errors,
+            syscall = parts[idx].decode(errors="replace") if idx < len(parts) else ""
+        # Handle the 'total' summary row which appears with 'total' as syscall name in some versions
+        if syscall.lower() == "total":
+            total = {
+                "pct_time": pct_time if pct_time else 100.0,
                 "seconds": seconds,
                 "usecs_per_call": usecs_per_call,
-                "pct_time": pct_time,
-            })
+                "calls": calls,
+                "errors": errors,
+            }
+            continue
+        if not syscall:
+            continue
+        rows.append((syscall, calls, errors, seconds, usecs_per_call, pct_time))
 
-        # Sort by seconds desc then calls desc for readability
-        rows.sort(key=lambda r: (r.get("seconds", 0.0), r.get("calls", 0)), reverse=True)
-        return {"syscalls": rows, "total": total} if rows else {"raw": "\n".join(raw_lines)}
-    finally:
-        try:
-            os.unlink(tmp.name)
-        except Exception:
-            pass
+    # Sort by seconds desc then calls desc for readability; dicts are only built for output
+    rows.sort(key=itemgetter(3, 1), reverse=True)
+    if not rows:
+        return {"raw": raw()}
+    return {"syscalls": [dict(zip(STRACE_ROW_FIELDS, r)) for r in rows], "total": total}
+
+# Memcheck summary lines, optionally prefixed by valgrind's "==PID==" marker
+MEMCHECK_LINE_RE = re.compile(
+    r"(?:==\d+==)?\s*(ERROR SUMMARY|definitely lost|indirectly lost|possibly lost|still reachable|suppressed):\s+([\d,]+)"
+)
+MEMCHECK_KEYS = {
+    "ERROR SUMMARY": "errors",
+    "definitely lost": "definitely_lost_bytes",
+    "indirectly lost": "indirectly_lost_bytes",
+    "possibly lost": "possibly_lost_bytes",
+    "still reachable": "still_reachable_bytes",
+    "suppressed": "suppressed_bytes",
+}
 
 def run_valgrind_memcheck(binary: str, args: list) -> Dict[str, Any]:
     """Run valgrind memcheck and parse leak summary and error count."""
-    # Capture stderr where memcheck writes its summary
-    proc = subprocess.run([
-        "valgrind", "--tool=memcheck", "--leak-check=summary", "--track-origins=no",
-        binary, *args
-    ], stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
-    out = proc.stderr.splitlines()
     res: Dict[str, Any] = {}
-    for ln in out:
-        s = ln.strip()
-        if s.startswith("ERROR SUMMARY:"):
+    match = MEMCHECK_LINE_RE.match
+    # Memcheck writes its summary to --log-fd; consume it line by line while valgrind runs
+    with _popen_with_report_fd(lambda fd: [
+        "valgrind", "--tool=memcheck", "--leak-check=summary", "--track-origins=no",
+        f"--log-fd={fd}", binary, *args
+    ]) as (_, report):
+        for ln in report:
             # e.g., ERROR SUMMARY: 0 errors from 0 contexts (suppressed: 0 from 0)
-            try:
-                num = int(s.split(':',1)[1].strip().split()[0])
-                res["errors"] = num
-            except Exception:
-                pass
-        elif s.startswith("definitely lost:"):
-            # definitely lost: 0 bytes in 0 blocks
-            try:
-                res["definitely_lost_bytes"] = int(s.split(':',1)[1].strip().split()[0].replace(',',''))
-            except Exception:
-                pass
-        elif s.startswith("indirectly lost:"):
-            try:
-                res["indirectly_lost_bytes"] = int(s.split(':',1)[1].strip().split()[0].replace(',',''))
-            except Exception:
-                pass
-        elif s.startswith("possibly lost:"):
-            try:
-                res["possibly_lost_bytes"] = int(s.split(':',1)[1].strip().split()[0].replace(',',''))
-            except Exception:
-                pass
-        elif s.startswith("still reachable:"):
-            try:
-                res["still_reachable_bytes"] = int(s.split(':',1)[1].strip().split()[0].replace(',',''))
-            except Exception:
-                pass
-        elif s.startswith("suppressed:"):
-            try:
-                res["suppressed_bytes"] = int(s.split(':',1)[1].strip().split()[0].replace(',',''))
-            except Exception:
-                pass
+            #       definitely lost: 0 bytes in 0 blocks
+            m = match(ln)
+            if m:
+                res[MEMCHECK_KEYS[m.group(1)]] = int(m.group(2).replace(",", ""))
     return res
-def run_max_rss_kb(binary: str, args: list) -> int | None:
-    """Run the target once under /usr/bin/time -v and return Max RSS in KB.
-    Returns None if /usr/bin/time is unavailable or parsing fails.
-    """
-    time_path = "/usr/bin/time"
-    if not os.path.exists(time_path):
-        return None
-    tmp = tempfile.NamedTemporaryFile(delete=False, mode="w+")
-    tmp.close()
+
+def _parse_massif_time(v: bytes):
+    # time units can vary (i/instruction by default). Keep raw value.
     try:
-        # Run with verbose time, directing its output to the tmp file
-        cmd = [time_path, "-v", "-o", tmp.name, binary, *args]
-        subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        with open(tmp.name, "r") as f:
-            for line in f:
-                if "Maximum resident set size" in line:
-                    # Format: Maximum resident set size (kbytes): 12345
-                    parts = line.strip().split(":", 1)
-                    if len(parts) == 2:
-                        try:
-                            return int(parts[1].strip())
-                        except ValueError:
-                            return None
-    finally:
+        return int(v)
+    except ValueError:
         try:
-            os.unlink(tmp.name)
-        except Exception:
-            pass
-    return None
+            return float(v)
+        except ValueError:
+            return None
+
+def _massif_field(mm, key: bytes, start: int, end: int):
+    """Return the raw bytes after `key` up to end of line within mm[start:end], or None."""
+    i = mm.find(key, start, end)
+    if i < 0:
+        return None
+    i += len(key)
+    j = mm.find(b"\n", i, end)
+    return mm[i:j if j >= 0 else end]
 
-def run_valgrind(binary: str, args: list) -> Dict[str, Any]:
+def run_valgrind(binary: str, args: list, tdir: str, pages_as_heap: bool = False) -> Dict[str, Any]:
     """Run valgrind Massif and parse peak memory from the raw massif output.
+    pages_as_heap counts every mmap'd page (closer to real usage, but far slower).
     Returns keys with _bytes suffix and additional context (snapshot/time).
+    The massif file is written to `tdir`, the per-run scratch directory.
     """
-    massif_out = tempfile.NamedTemporaryFile(delete=False)
-    massif_out.close()
+    peak_heap = peak_extra = peak_total = peak_stacks = 0
+    peak_time = peak_snap = None
+
+    massif_out = os.path.join(tdir, "massif.out")
     cmd = [
         "valgrind",
         "--tool=massif",
-        f"--massif-out-file={massif_out.name}",
-        # Count mmap'd pages as heap to better reflect real usage
-        "--pages-as-heap=yes",
-        binary,
-        *args,
+        f"--massif-out-file={massif_out}",
     ]
+    if pages_as_heap:
+        # Count mmap'd pages as heap to better reflect real usage
+        cmd.append("--pages-as-heap=yes")
+    cmd += [binary, *args]
     subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
 
-    peak = {
-        "massif_peak_heap_bytes": 0,
-        "massif_peak_heap_extra_bytes": 0,
-        "massif_peak_total_bytes": 0,
-        "massif_peak_stacks_bytes": 0,
-        "massif_peak_time": None,
-        "massif_peak_snapshot": None,
+    with open(massif_out, "rb") if os.path.exists(massif_out) else contextlib.nullcontext() as f:
+        size = os.fstat(f.fileno()).st_size if f else 0
+        # Jump between "snapshot=" blocks with find() on the mapped bytes and slice only
+        # the four values we need; heap_tree lines are never materialised
+        with (mmap.mmap(f.fileno(), 0, prot=mmap.PROT_READ) if size else contextlib.nullcontext(b"")) as mm:
+            find = mm.find
+            pos = find(b"\nsnapshot=")
+            while pos >= 0:
+                nxt = find(b"\nsnapshot=", pos + 10)
+                end = nxt if nxt >= 0 else size
+                heap = int(_massif_field(mm, b"\nmem_heap_B=", pos, end) or 0)
+                extra = int(_massif_field(mm, b"\nmem_heap_extra_B=", pos, end) or 0)
+                total = heap + extra
+                if total > peak_total:
+                    peak_heap = heap
+                    peak_extra = extra
+                    peak_total = total
+                    peak_stacks = int(_massif_field(mm, b"\nmem_stacks_B=", pos, end) or 0)
+                    t = _massif_field(mm, b"\ntime=", pos, end)
+                    peak_time = _parse_massif_time(t) if t is not None else None
+                    peak_snap = int(_massif_field(mm, b"\nsnapshot=", pos, end))
+                pos = nxt
+
+    return {
+        "massif_peak_heap_bytes": peak_heap,
+        "massif_peak_heap_extra_bytes": peak_extra,
+        "massif_peak_total_bytes": peak_total,
+        "massif_peak_stacks_bytes": peak_stacks,
+        "massif_peak_time": peak_time,
+        "massif_peak_snapshot": peak_snap,
     }
 
-    cur_heap = cur_extra = cur_stacks = 0
-    cur_time = None
-    cur_snap = None
-
-    def consider():
-        nonlocal peak, cur_heap, cur_extra, cur_stacks, cur_time, cur_snap
-        total = cur_heap + cur_extra
-        if total > peak["massif_peak_total_bytes"]:
-            peak.update({
-                "massif_peak_heap_bytes": cur_heap,
-                "massif_peak_heap_extra_bytes": cur_extra,
-                "massif_peak_total_bytes": total,
-                "massif_peak_stacks_bytes": cur_stacks,
-                "massif_peak_time": cur_time,
-                "massif_peak_snapshot": cur_snap,
-            })
+# Interval between /proc/<pid>/status samples in count_threads
+THREAD_SAMPLE_INTERVAL_S = 0.001
 
+def count_threads(binary: str, args: list) -> int:
+    """Peak thread count of one run of the binary, sampled from /proc/{pid}/status until it exits."""
     try:
-        with open(massif_out.name) as f:
-            for line in f:
-                line = line.strip()
-                if line.startswith("snapshot="):
-                    # finish previous snapshot before resetting
-                    if cur_snap is not None:
-                        consider()
-                    cur_snap = int(line.split("=", 1)[1])
-                    cur_heap = cur_extra = cur_stacks = 0
-                    cur_time = None
-                elif line.startswith("time="):
-                    # time units can vary (i/instruction by default). Keep raw value.
-                    v = line.split("=", 1)[1]
-                    try:
-                        cur_time = int(v)
-                    except ValueError:
-                        try:
-                            cur_time = float(v)
-                        except ValueError:
-                            cur_time = None
-                elif line.startswith("mem_heap_B="):
-                    cur_heap = int(line.split("=", 1)[1])
-                elif line.startswith("mem_heap_extra_B="):
-                    cur_extra = int(line.split("=", 1)[1])
-                elif line.startswith("mem_stacks_B="):
-                    cur_stacks = int(line.split("=", 1)[1])
-            # final snapshot
-            if cur_snap is not None:
-                consider()
-    finally:
+        proc = subprocess.Popen([binary, *args], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    except OSError:
+        return 1  # Default to single-threaded if we can't detect
+    status_path = f"/proc/{proc.pid}/status"
+    peak = 1
+    # The pid stays ours until poll() reaps it, so every read below sees this process.
+    # The "Threads:" line is one small read, unlike listing /proc/{pid}/task.
+    while proc.poll() is None:
         try:
-            os.unlink(massif_out.name)
-        except Exception:
-            pass
-
+            with open(status_path, "rb") as f:
+                status = f.read()
+            peak = max(peak, int(status[status.index(b"\nThreads:") + 9:].split(None, 1)[0]))
+        except (OSError, ValueError, IndexError):
+            break
+        time.sleep(THREAD_SAMPLE_INTERVAL_S)
+    proc.wait()
     return peak
 
-def main():
-    parser = argparse.ArgumentParser(description="Python profiler using perf and valgrind.")
-    parser.add_argument("binary", help="Path to binary to profile")
-    parser.add_argument("-o", "--output", default="profile.json", help="Output JSON file ('.json' will be appended if missing)")
-    # Parse known args so -o can appear before or after the binary. Remaining args go to the target binary.
-    known_args, program_args = parser.parse_known_args()
+def stripped_binary_size(binary: str, tdir: str) -> int:
+    """Size in bytes of `binary` after strip(1), written to memory rather than disk.
 
-    binary = known_args.binary
-    
-    # Check for required tools before execution
-    missing_tools = []
-    # perf presence and usability
-    perf_ok = False
-    perf_usable = False
-    perf_note = None
-    if shutil.which("perf"):
+    Uses an anonymous memfd where available and falls back to a file in `tdir`, the
+    per-run scratch directory (on /dev/shm when available).
+    """
+    try:
+        fd = os.memfd_create("stripped", 0)
+    except (AttributeError, OSError):
+        fd = None
+    if fd is not None:
         try:
-            rv = subprocess.run(["perf", "version"], capture_output=True, text=True, timeout=3)
-            perf_ok = (rv.returncode == 0 and "perf version" in (rv.stdout or ""))
-        except Exception:
-            perf_ok = False
-        if perf_ok:
-            # Check kernel perf_event_paranoid level early and REQUIRE it to be exactly '1'.
-            # Many systems set this to a restrictive value; per your request we only
-            # proceed when it's 1.
-            perf_paranoid_level = None
-            try:
-                with open("/proc/sys/kernel/perf_event_paranoid", "r") as pf:
-                    perf_paranoid_level = pf.read().strip()
-            except Exception:
-                perf_paranoid_level = None
-
-            # Enforce exact value of 1. If it's not 1, abort with a helpful message.
-            if perf_paranoid_level is None:
-                print("Error: unable to determine /proc/sys/kernel/perf_event_paranoid.\n"
-                      "perf requires perf_event_paranoid == 1 to run unprivileged counters.", file=sys.stderr)
-                sys.exit(1)
+            # strip runs in a child, so hand it the memfd and address it via its own fd table
+            subprocess.run(["strip", binary, "-o", f"/proc/self/fd/{fd}"], pass_fds=(fd,), check=True)
+            return os.fstat(fd).st_size
+        finally:
+            os.close(fd)
+    path = os.path.join(tdir, "stripped")
+    subprocess.run(["strip", binary, "-o", path], check=True)
+    return os.stat(path).st_size
 
-            try:
-                if int(perf_paranoid_level) != 1:
-                    print(f"Error: kernel perf_event_paranoid={perf_paranoid_level}.\n"
-                          "This profiler requires perf_event_paranoid to be set to 1 to run perf counters unprivileged.\n"
-                          "Set it as root with: sudo sh -c 'echo 1 > /proc/sys/kernel/perf_event_paranoid'\n"
-                          "Or run with appropriate privileges.", file=sys.stderr)
-                    sys.exit(1)
-                # paranoid == 1, do a quick perf probe to confirm usability
-                test = subprocess.run(["perf", "stat", "-e", "task-clock", "/bin/true"], capture_output=True, text=True, timeout=4)
-                out = (test.stdout or "") + (test.stderr or "")
-                if test.returncode == 0 and "task-clock" in out:
-                    perf_usable = True
-                else:
-                    perf_usable = False
-                    perf_note = f"perf probe failed despite perf_event_paranoid=1"
-            except Exception:
-                print("Error: unexpected failure while probing perf; ensure perf is installed and usable.", file=sys.stderr)
-                sys.exit(1)
-            try:
-                test = subprocess.run(["perf", "stat", "-e", "task-clock", "/bin/true"], capture_output=True, text=True, timeout=4)
-                out = (test.stdout or "") + (test.stderr or "")
-                if test.returncode == 0 and "task-clock" in out:
-                    perf_usable = True
-                else:
-                    perf_usable = False
-            except Exception as e:
-                perf_usable = False
+def _parse_cpu_list(text: str) -> list:
+    """Expand a kernel CPU list such as "2-3,6" into [2, 3, 6]."""
+    cpus = []
+    for part in text.strip().split(","):
+        if not part:
+            continue
+        lo, _, hi = part.partition("-")
+        cpus.extend(range(int(lo), int(hi or lo) + 1))
+    return cpus
+
+def _format_cpu_list(cpus) -> str:
+    """Format CPU numbers in kernel list form, e.g. {0, 1, 2, 6} -> "0-2,6"."""
+    parts = []
+    for c in sorted(cpus):
+        if parts and parts[-1][1] == c - 1:
+            parts[-1][1] = c
         else:
-            # present but version failed; treat as missing
-            pass
-    else:
-        perf_ok = False
+            parts.append([c, c])
+    return ",".join(f"{lo}-{hi}" if hi != lo else f"{lo}" for lo, hi in parts)
 
-    if not perf_ok:
-        missing_tools.append("perf")
-    if not shutil.which("valgrind"):
-        missing_tools.append("valgrind")
-    if not shutil.which("strace"):
-        missing_tools.append("strace")
-    
-    if missing_tools:
-        print(f"Error: Missing required tools: {', '.join(missing_tools)}", file=sys.stderr)
-        print("Please install them before running the profiler.", file=sys.stderr)
-        sys.exit(1)
-    # Ensure output ends with .json
-    output_path = known_args.output
-    if not output_path.lower().endswith(".json"):
-        output_path = output_path + ".json"
+def pick_cpu(spec: str) -> int:
+    """Resolve --cpu: an explicit core number, or 'auto' for the first isolated core
+    (/sys/devices/system/cpu/isolated) falling back to the last core we may run on.
+
+    Raises ValueError when the core is outside this process's affinity mask (cpuset/taskset),
+    since sched_setaffinity would reject it.
+    """
+    allowed = os.sched_getaffinity(0)
+    if spec != "auto":
+        cpu = int(spec)
+        if cpu not in allowed:
+            raise ValueError(f"CPU {cpu} is not in the allowed set {_format_cpu_list(allowed)}")
+        return cpu
+    try:
+        with open("/sys/devices/system/cpu/isolated", "r") as f:
+            isolated = [c for c in _parse_cpu_list(f.read()) if c in allowed]
+    except (OSError, ValueError):
+        isolated = []
+    return isolated[0] if isolated else max(allowed)
+
+@contextlib.contextmanager
+def pinned_to_cpu(cpu):
+    """Pin the calling thread (and so the children it spawns) to `cpu`; restore on exit.
 
-    # Memory sections size
-    mem_sections = None
+    As root the thread is also switched to SCHED_RR to cut scheduling jitter. Round-robin
+    rather than FIFO: every target thread shares this one core at the same priority, and
+    FIFO would never time-slice them, so a thread spin-waiting on a sibling could spin forever.
+    A None cpu is a no-op.
+    """
+    if cpu is None:
+        yield
+        return
+    prev_affinity = os.sched_getaffinity(0)
+    os.sched_setaffinity(0, {cpu})
+    prev_sched = None
+    if os.geteuid() == 0:
+        try:
+            prev_sched = (os.sched_getscheduler(0), os.sched_getparam(0))
+            os.sched_setscheduler(0, os.SCHED_RR, os.sched_param(50))
+        except OSError:
+            prev_sched = None
+    try:
+        yield
+    finally:
+        if prev_sched is not None:
+            os.sched_setscheduler(0, *prev_sched)
+        os.sched_setaffinity(0, prev_affinity)
+
+def _read_paranoid():
+    """Return /proc/sys/kernel/perf_event_paranoid as a string, or None if unreadable."""
+    try:
+        with open("/proc/sys/kernel/perf_event_paranoid", "r") as pf:
+            return pf.read().strip()
+    except Exception:
+        return None
+
+@functools.lru_cache(maxsize=None)
+def _host_info() -> Dict[str, Any]:
+    """Static per-host facts, computed once per process.
+
+    available_cpus is the size of the affinity mask (taskset/cpusets), falling back to
+    os.cpu_count(). A CFS bandwidth quota (cgroup cpu.max) does not show up in the mask,
+    so under a quota-only container limit this is still the host's CPU count.
+    """
+    try:
+        available = len(os.sched_getaffinity(0))
+    except (AttributeError, OSError):
+        available = os.cpu_count() or 1
+    return {"available_cpus": available, "arch": platform.machine(), "perf_paranoid": _read_paranoid()}
+
+# ELF section header constants used for Berkeley-style (size -B) accounting
+SHT_NOBITS = 8
+SHF_WRITE, SHF_ALLOC, SHF_EXECINSTR = 0x1, 0x2, 0x4
+# EI_CLASS -> (e_shoff offset, e_shentsize offset, section header layout: flags, size)
+ELF_LAYOUTS = {
+    1: (0x20, 0x2E, "I I I I I I", 2, 5),   # ELF32: name type flags addr offset size
+    2: (0x28, 0x3A, "I I Q Q Q Q", 2, 5),   # ELF64
+}
+
+def _elf_sections(binary: str):
+    """Sum ELF section sizes the way `size -B` does: text/data/bss/total bytes, or None.
+
+    Reads the section header table straight from an mmap of the file, no subprocess.
+    Allocated sections count as text when executable or read-only, as bss when they
+    occupy no file space (SHT_NOBITS), and as data otherwise.
+    """
+    try:
+        with open(binary, "rb") as f, mmap.mmap(f.fileno(), 0, prot=mmap.PROT_READ) as mm:
+            if mm[:4] != b"\x7fELF" or mm[4] not in ELF_LAYOUTS or mm[5] not in (1, 2):
+                return None
+            shoff_at, shent_at, layout, flags_i, size_i = ELF_LAYOUTS[mm[4]]
+            endian = "<" if mm[5] == 1 else ">"
+            word = "I" if mm[4] == 1 else "Q"
+            (shoff,) = struct.unpack_from(endian + word, mm, shoff_at)
+            shentsize, shnum = struct.unpack_from(endian + "HH", mm, shent_at)
+            shdr = struct.Struct(endian + layout.replace(" ", ""))
+            text = data = bss = 0
+            for i in range(shnum):
+                hdr = shdr.unpack_from(mm, shoff + i * shentsize)
+                flags, size = hdr[flags_i], hdr[size_i]
+                if not flags & SHF_ALLOC:
+                    continue
+                if flags & SHF_EXECINSTR or not flags & SHF_WRITE:
+                    text += size
+                elif hdr[1] != SHT_NOBITS:
+                    data += size
+                else:
+                    bss += size
+    except (OSError, ValueError, struct.error):
+        return None
+    if not (text or data or bss):
+        return None
+    return {"text_bytes": text, "data_bytes": data, "bss_bytes": bss, "total_bytes": text + data + bss}
+
+def _size_sections(binary: str):
+    """Section sizes from the ELF headers, falling back to parsing `size -B -d`, or None."""
+    sections = _elf_sections(binary)
+    if sections is not None:
+        return sections
     try:
         size_out = subprocess.check_output(["size", "-B", "-d", binary], text=True)
         lines = size_out.strip().splitlines()
@@ -553,447 +878,416 @@ def main():
                         numeric_fields.append(f)
                         break
             if len(numeric_fields) >= 4:
-                mem_sections = {
+                return {
                     "text_bytes": int(numeric_fields[0]),
                     "data_bytes": int(numeric_fields[1]),
                     "bss_bytes": int(numeric_fields[2]),
                     "total_bytes": int(numeric_fields[3])
                 }
-    except Exception as e:
-        mem_sections = None
+    except Exception:
+        pass
+    return None
 
-    # Architecture
-    import platform
-    arch = None
+def _file_arch(binary: str):
+    """Architecture string from file(1) (e.g. "x86-64"), or None if file(1) failed."""
     try:
         file_out = subprocess.check_output(["file", binary], text=True)
-        if "," in file_out:
-            arch = file_out.split(",")[1].strip()
-        else:
-            arch = file_out.strip()
     except Exception:
-        arch = platform.machine()
-
-    # Binary sizes
-    unstripped_size = os.path.getsize(binary)
-    stripped_size = None
-    if shutil.which("strip"):
-        import tempfile
-        tmp_stripped = tempfile.NamedTemporaryFile(delete=False)
-        tmp_stripped.close()
-        subprocess.run(["strip", binary, "-o", tmp_stripped.name], check=True)
-        stripped_size = os.path.getsize(tmp_stripped.name)
-        os.unlink(tmp_stripped.name)
-
-    perf_data = run_perf_stat(binary, program_args) if perf_usable else {}
-    # Wait time: elapsed - (user + sys), clamped to non-negative
-    wait_time = None
+        return None
+    if "," in file_out:
+        return file_out.split(",")[1].strip()
+    return file_out.strip()
+
+# Static facts about a binary (size sections, arch, stripped size), persisted across runs
+BINARY_INFO_CACHE = os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "profiler.json")
+BINARY_INFO_CACHE_MAX = 256
+
+def _load_binary_info_cache() -> Dict[str, Any]:
     try:
-        if "elapsed_s" in perf_data and "user_s" in perf_data and "sys_s" in perf_data:
-            wait_time = max(0.0, perf_data["elapsed_s"] - (perf_data["user_s"] + perf_data["sys_s"]))
-    except Exception:
-        wait_time = None
-
-    # Functional grouping
-    timing = {}
-    if "elapsed_s" in perf_data: timing["elapsed_s"] = perf_data["elapsed_s"]
-    if "user_s" in perf_data: timing["user_s"] = perf_data["user_s"]
-    if "sys_s" in perf_data: timing["sys_s"] = perf_data["sys_s"]
-    if wait_time is not None: timing["wait_time_s"] = wait_time
-    if "task_clock_ms" in perf_data: timing["task_clock_ms"] = perf_data["task_clock_ms"]
-    # CPU utilization derived from task-clock vs elapsed
-    if "task_clock_ms" in timing and "elapsed_s" in timing and timing["elapsed_s"] > 0:
-        util = 100.0 * (timing["task_clock_ms"] / (timing["elapsed_s"] * 1000.0))
-        timing["cpu_utilization_pct"] = round(util, 3)
+        with open(BINARY_INFO_CACHE, "rb") as f:
+            cache = _loads(f.read())
+    except (OSError, ValueError):
+        return {}
+    return cache if isinstance(cache, dict) else {}
+
+def _save_binary_info_cache(cache: Dict[str, Any]) -> None:
+    # Keep the newest entries and replace the file atomically so concurrent runs never see a torn write
+    while len(cache) > BINARY_INFO_CACHE_MAX:
+        del cache[next(iter(cache))]
+    try:
+        os.makedirs(os.path.dirname(BINARY_INFO_CACHE), exist_ok=True)
+        tmp = f"{BINARY_INFO_CACHE}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(_dumps(cache))
+        os.replace(tmp, BINARY_INFO_CACHE)
+    except OSError:
+        pass
+
+# In-process layer over BINARY_INFO_CACHE for repeated main() calls (batch profiling)
+_binary_info_memo: Dict[str, Any] = {}
+
+def binary_info(binary: str, mtime_ns: int, size: int, tdir: str) -> Dict[str, Any]:
+    """Return {"sections", "arch", "stripped_bytes"} for a binary.
+
+    Keyed on (realpath, mtime, size) both in-process and in BINARY_INFO_CACHE, so an
+    unchanged binary skips the size/file/strip subprocesses; on a miss they run concurrently.
+    `tdir` is the per-run scratch directory for strip's fallback output file.
+    """
+    key = f"{os.path.realpath(binary)}:{mtime_ns}:{size}"
+    info = _binary_info_memo.get(key)
+    if info is not None:
+        return info
+    cache = _load_binary_info_cache()
+    info = cache.get(key)
+    if isinstance(info, dict):
+        _binary_info_memo[key] = info
+        return info
+    with ThreadPoolExecutor(max_workers=3) as ex:
+        f_sections = ex.submit(_size_sections, binary)
+        f_arch = ex.submit(_file_arch, binary)
+        f_stripped = ex.submit(stripped_binary_size, binary, tdir) if shutil.which("strip") else None
+        stripped = None
+        if f_stripped is not None:
+            try:
+                stripped = f_stripped.result()
+            except (OSError, subprocess.CalledProcessError):
+                pass
+        info = {
+            "sections": f_sections.result(),
+            "arch": f_arch.result(),
+            "stripped_bytes": stripped,
+        }
+    # Only remember complete answers: a missing strip/size or failing file(1) is a property
+    # of this run's environment, not of the binary, so retry those probes next time
+    if all(v is not None for v in info.values()):
+        _binary_info_memo[key] = info
+        cache[key] = info
+        _save_binary_info_cache(cache)
+    if info["arch"] is None:
+        info["arch"] = _host_info()["arch"]
+    return info
+
+@functools.lru_cache(maxsize=2)
+def _probe_tools(trust_perf: bool = False) -> Dict[str, Any]:
+    """Probe external tool availability once per process.
+
+    Returns perf_ok, perf_paranoid_level, perf_usable (None if the perf probe itself
+    failed unexpectedly), perf_json (perf stat -j supported), perf_rusage (user_time /
+    system_time tool events supported), valgrind, strace and
+    strace_columns (strace supports -U/--summary-columns). The result is cached so repeated
+    main() calls in one process (batch profiling) do not respawn the probes.
+    trust_perf skips the `perf stat /bin/true` usability run once perf and the
+    paranoid level check out.
+    """
+    tools: Dict[str, Any] = {
+        "perf_ok": False,
+        "perf_paranoid_level": None,
+        "perf_usable": False,
+        "perf_json": False,
+        "perf_rusage": False,
+        "valgrind": shutil.which("valgrind") is not None,
+        "strace": shutil.which("strace") is not None,
+        "strace_columns": False,
+    }
+    if tools["strace"]:
         try:
-            cores = os.cpu_count() or 1
+            rv = subprocess.run(["strace", "--help"], capture_output=True, text=True, timeout=3)
+            tools["strace_columns"] = "--summary-columns" in (rv.stdout or "") + (rv.stderr or "")
         except Exception:
-            cores = 1
-        timing["cpu_utilization_per_core_pct"] = round(util / cores, 3)
-    # Fallback to /usr/bin/time -v to populate missing timing
-    if "elapsed_s" not in timing or "user_s" not in timing or "sys_s" not in timing:
-        tv = run_time_v_timing(binary, program_args)
-        # only add if not present
-        for k, v in tv.items():
-            if k not in timing:
-                timing[k] = v
+            pass
+    if not shutil.which("perf"):
+        return tools
+    try:
+        rv = subprocess.run(["perf", "version"], capture_output=True, text=True, timeout=3)
+        tools["perf_ok"] = (rv.returncode == 0 and "perf version" in (rv.stdout or ""))
+        m = re.search(r"perf version (\d+)\.(\d+)", rv.stdout or "")
+        version = (int(m.group(1)), int(m.group(2))) if m is not None else None
+        tools["perf_json"] = version is not None and version >= PERF_JSON_MIN_VERSION
+        tools["perf_rusage"] = version is not None and version >= PERF_RUSAGE_MIN_VERSION
+    except Exception:
+        tools["perf_ok"] = False
+    if not tools["perf_ok"]:
+        # present but version failed; treat as missing
+        return tools
+
+    tools["perf_paranoid_level"] = _host_info()["perf_paranoid"]
+    try:
+        if int(tools["perf_paranoid_level"]) != 1:
+            return tools
+    except (TypeError, ValueError):
+        return tools
+
+    if trust_perf:
+        # Caller vouches for perf (e.g. CI images); skip the probe run
+        tools["perf_usable"] = True
+        return tools
+
+    # paranoid == 1, do a quick perf probe to confirm usability
+    try:
+        test = subprocess.run(["perf", "stat", "-e", "task-clock", "/bin/true"], capture_output=True, text=True, timeout=4)
+        out = (test.stdout or "") + (test.stderr or "")
+        tools["perf_usable"] = test.returncode == 0 and "task-clock" in out
+    except Exception:
+        tools["perf_usable"] = None
+    return tools
+
+def main():
+    parser = argparse.ArgumentParser(description="Python profiler using perf and valgrind.")
+    parser.add_argument("binary", help="Path to binary to profile")
+    parser.add_argument("-o", "--output", default="profile.json", help="Output JSON file ('.json' will be appended if missing)")
+    parser.add_argument("--massif", choices=["off", "fast", "pages"], default="off",
+                        help="Valgrind Massif mode: 'fast' tracks heap allocations only, "
+                             "'pages' also counts mmap'd pages (much slower), 'off' (default) skips Massif")
+    parser.add_argument("--memcheck", action="store_true",
+                        help="Also run Valgrind Memcheck for a leak summary (slow; off by default)")
+    parser.add_argument("--hugepages", choices=["off", "madvise", "hugetlb"], default="off",
+                        help="Also measure the target with a huge-page-backed heap (glibc.malloc.hugetlb) "
+                             "and report TLB/cycle deltas under memory.hugepages")
+    parser.add_argument("--trust-perf", action="store_true",
+                        help="Skip the perf usability probe run (for CI images known to allow perf)")
+    parser.add_argument("--cpu", metavar="N|auto",
+                        help="Pin the perf and time -v runs to one core ('auto' picks an isolated core, "
+                             "else the last allowed one); as root they also run SCHED_RR")
+    parser.add_argument("--serial", action="store_true",
+                        help="Run strace/valgrind/thread probes one at a time instead of concurrently")
+    # Parse known args so -o can appear before or after the binary. Remaining args go to the target binary.
+    known_args, program_args = parser.parse_known_args()
+
+    binary = known_args.binary
+    
+    # Check for required tools before execution
+    tools = _probe_tools(known_args.trust_perf)
+    perf_ok = tools["perf_ok"]
+    perf_usable = tools["perf_usable"]
+    if perf_ok:
+        # Check kernel perf_event_paranoid level early and REQUIRE it to be exactly '1'.
+        # Many systems set this to a restrictive value; per your request we only
+        # proceed when it's 1.
+        perf_paranoid_level = tools["perf_paranoid_level"]
+
+        # Enforce exact value of 1. If it's not 1, abort with a helpful message.
+        if perf_paranoid_level is None:
+            print("Error: unable to determine /proc/sys/kernel/perf_event_paranoid.\n"
+                  "perf requires perf_event_paranoid == 1 to run unprivileged counters.", file=sys.stderr)
+            sys.exit(1)
+
+        try:
+            paranoid_ok = int(perf_paranoid_level) == 1
+        except ValueError:
+            paranoid_ok = None
+        if paranoid_ok is False:
+            print(f"Error: kernel perf_event_paranoid={perf_paranoid_level}.\n"
+                  "This profiler requires perf_event_paranoid to be set to 1 to run perf counters unprivileged.\n"
+                  "Set it as root with: sudo sh -c 'echo 1 > /proc/sys/kernel/perf_event_paranoid'\n"
+                  "Or run with appropriate privileges.", file=sys.stderr)
+            sys.exit(1)
+        if paranoid_ok is None or perf_usable is None:
+            print("Error: unexpected failure while probing perf; ensure perf is installed and usable.", file=sys.stderr)
+            sys.exit(1)
+
+    missing_tools = []
+    if not perf_ok:
+        missing_tools.append("perf")
+    # Valgrind runs are opt-in and are only required when requested
+    if not tools["valgrind"] and (known_args.massif != "off" or known_args.memcheck):
+        missing_tools.append("valgrind")
+    if not tools["strace"]:
+        missing_tools.append("strace")
+    
+    if missing_tools:
+        print(f"Error: Missing required tools: {', '.join(missing_tools)}", file=sys.stderr)
+        print("Please install them before running the profiler.", file=sys.stderr)
+        sys.exit(1)
+    # Ensure output ends with .json
+    output_path = known_args.output
+    if not output_path.lower().endswith(".json"):
+        output_path = output_path + ".json"
+
+    host = _host_info()
+
+    # One stat serves both the unstripped size and the binary-info cache key
+    st = os.stat(binary)
+    unstripped_size = st.st_size
+
+    # One private scratch directory per run for tool output files (strace -o, massif, strip -o);
+    # the collectors finish inside it, so it is removed with its contents once they are done
+    with tempfile.TemporaryDirectory(prefix="profiler_", dir=SCRATCH_DIR) as tdir:
+        # Memory sections, architecture and stripped size (cached per binary version)
+        info = binary_info(binary, st.st_mtime_ns, st.st_size, tdir)
+        mem_sections = info["sections"]
+        arch = info["arch"]
+        stripped_size = info["stripped_bytes"]
+
+        # Serial measurement phase, optionally pinned to one core (--cpu)
+        pin_cpu = None
+        if known_args.cpu is not None:
+            try:
+                pin_cpu = pick_cpu(known_args.cpu)
+            except (ValueError, OSError) as e:
+                print(f"Error: invalid --cpu {known_args.cpu!r}: {e}", file=sys.stderr)
+                sys.exit(1)
+        with pinned_to_cpu(pin_cpu):
+            perf_data = run_perf_stat(binary, program_args, json_output=tools["perf_json"],
+                                      rusage_events=tools["perf_rusage"]) if perf_usable else {}
+            # Optional second perf run with a huge-page heap; serial like the baseline so the deltas are fair
+            hugepages = None
+            if known_args.hugepages != "off" and perf_data:
+                hugepages = run_perf_stat_hugepages(binary, program_args, known_args.hugepages, perf_data,
+                                                    json_output=tools["perf_json"])
+            # One /usr/bin/time -v run provides Max RSS, user/sys when perf lacks the
+            # user_time/system_time events, and all timings when perf measured nothing
+            tv = run_time_v_timing(binary, program_args)
+
+        # Size of the affinity mask the measured runs actually had: one core when pinned
+        run_cpus = 1 if pin_cpu is not None else host["available_cpus"]
+
+        # Functional grouping
+        timing = {dst: perf_data[src] for src, dst in _TIMING_KEYS if src in perf_data}
+        # CPU utilization derived from task-clock vs elapsed
+        if "task_clock_ms" in timing and "elapsed_s" in timing and timing["elapsed_s"] > 0:
+            util = 100.0 * (timing["task_clock_ms"] / (timing["elapsed_s"] * 1000.0))
+            timing["cpu_utilization_pct"] = round(util, 3)
+            timing["cpu_utilization_per_core_pct"] = round(util / run_cpus, 3)
+        max_rss_kb = tv.pop("max_rss_kb", None)
+        if "elapsed_s" not in timing:
+            # No perf timing at all: take elapsed/user/sys/wait together from the time -v run
+            timing.update(tv)
+        else:
+            # elapsed and wait stay perf's (wait derives from that run's task-clock); only
+            # target-only user/sys CPU seconds may come from the time -v run
+            for k in ("user_s", "sys_s"):
+                if k not in timing and k in tv:
+                    timing[k] = tv[k]
+
+        # The remaining collectors each re-run the target and only wait on subprocesses,
+        # so run them concurrently. perf/time above stay serial: co-running tools would
+        # skew their timing and counter data. --serial keeps every target run isolated.
+        with ThreadPoolExecutor(max_workers=1 if known_args.serial else 4) as collectors:
+            f_syscalls = collectors.submit(run_strace_summary, binary, program_args, tdir, tools["strace_columns"])
+            f_threads = collectors.submit(count_threads, binary, program_args)
+            f_massif = None
+            if known_args.massif != "off":
+                f_massif = collectors.submit(run_valgrind, binary, program_args, tdir, known_args.massif == "pages")
+            f_memcheck = None
+            if known_args.memcheck:
+                f_memcheck = collectors.submit(run_valgrind_memcheck, binary, program_args)
+            syscalls = f_syscalls.result()
+            num_threads = f_threads.result()
+            massif = f_massif.result() if f_massif is not None else None
+            memcheck = f_memcheck.result() if f_memcheck is not None else None
 
     cpu = {}
     cache = {}
-    memory_access = {}
+    # Perf-derived memory fields, pre-seeded in output order so unset fields stay None;
+    # Max RSS, Massif, Memcheck and hugepages results are added further down
+    memory = dict.fromkeys(MEMORY_ACCESS_FIELDS)
     
     if perf_data:
-        # Core CPU metrics
-        if "instructions" in perf_data: cpu["instructions"] = perf_data["instructions"]
-        if "cycles" in perf_data: cpu["cycles"] = perf_data["cycles"]
-        if "ref_cycles" in perf_data: cpu["ref_cycles"] = perf_data["ref_cycles"]
-        
-        # IPC and frequency
-        if "instructions" in perf_data and "cycles" in perf_data and perf_data["cycles"]:
-            cpu["ipc"] = round(perf_data["instructions"] / perf_data["cycles"], 6)
-        if "cycles" in perf_data and "ref_cycles" in perf_data and perf_data["ref_cycles"]:
-            cpu["frequency_ratio"] = round(perf_data["cycles"] / perf_data["ref_cycles"], 6)
-        
-        # Pipeline stalls
-        if "stalled_cycles_frontend" in perf_data:
-            cpu["stalled_cycles_frontend"] = perf_data["stalled_cycles_frontend"]
-            if "cycles" in perf_data and perf_data["cycles"]:
-                cpu["frontend_stall_pct"] = round(100.0 * perf_data["stalled_cycles_frontend"] / perf_data["cycles"], 3)
-        if "stalled_cycles_backend" in perf_data:
-            cpu["stalled_cycles_backend"] = perf_data["stalled_cycles_backend"]
-            if "cycles" in perf_data and perf_data["cycles"]:
-                cpu["backend_stall_pct"] = round(100.0 * perf_data["stalled_cycles_backend"] / perf_data["cycles"], 3)
+        # Unsupported events are absent from perf_data, so key presence gates every derived metric
+        present = perf_data.keys()
+
+        # Core CPU, pipeline stall and branch counters
+        cpu.update({dst: perf_data[src] for src, dst in _CPU_KEYS if src in present})
         
-        # Branching
-        if "branches" in perf_data: cpu["branches"] = perf_data["branches"]
-        if "branch_misses" in perf_data: cpu["branch_misses"] = perf_data["branch_misses"]
-        if "branches" in perf_data and "branch_misses" in perf_data and perf_data["branches"]:
-            cpu["branch_miss_rate_pct"] = round(100.0 * perf_data["branch_misses"] / perf_data["branches"], 6)
+        # IPC, frequency, stall and branch-miss ratios (only when computable)
+        for dst, num, den, scale, digits in _CPU_RATIOS:
+            if num in present and den in present and perf_data[den]:
+                cpu[dst] = _ratio(perf_data[num], perf_data[den], scale, digits)
         
         # Instruction rate
         if "instructions" in cpu and "elapsed_s" in timing and timing.get("elapsed_s"):
             cpu["instructions_per_second"] = int(cpu["instructions"] / timing["elapsed_s"])
         
-        # L1 Data Cache - always include all fields
-        cache["l1d_loads"] = perf_data.get("l1_dcache_loads")
-        cache["l1d_load_misses"] = perf_data.get("l1_dcache_load_misses")
-        cache["l1d_stores"] = perf_data.get("l1_dcache_stores")
-        if perf_data.get("l1_dcache_loads") and perf_data.get("l1_dcache_load_misses"):
-            rate = 100.0 * perf_data["l1_dcache_load_misses"] / max(1, perf_data["l1_dcache_loads"])
-            cache["l1d_miss_rate_pct"] = round(min(rate, 100.0), 6)
-        else:
-            cache["l1d_miss_rate_pct"] = None
-        
-        # L1 Instruction Cache - always include all fields
-        cache["l1i_loads"] = perf_data.get("l1_icache_loads")
-        cache["l1i_load_misses"] = perf_data.get("l1_icache_load_misses")
-        if perf_data.get("l1_icache_loads") and perf_data.get("l1_icache_load_misses"):
-            rate = 100.0 * perf_data["l1_icache_load_misses"] / max(1, perf_data["l1_icache_loads"])
-            cache["l1i_miss_rate_pct"] = round(min(rate, 100.0), 6)
-        else:
-            cache["l1i_miss_rate_pct"] = None
+        # Flag counters whose values were extrapolated because of multiplexing
+        if "multiplexed_pct" in present:
+            cpu["note"] = "perf counters multiplexed (approximate): " + ", ".join(
+                f"{ev}={pct:.2f}%" for ev, pct in sorted(perf_data["multiplexed_pct"].items()))
         
-        # LLC (L3) - always include all fields
-        cache["llc_loads"] = perf_data.get("llc_loads")
-        cache["llc_load_misses"] = perf_data.get("llc_load_misses")
-        cache["llc_stores"] = perf_data.get("llc_stores")
-        cache["llc_store_misses"] = perf_data.get("llc_store_misses")
-        if perf_data.get("llc_loads") and perf_data.get("llc_load_misses"):
-            rate = 100.0 * perf_data["llc_load_misses"] / max(1, perf_data["llc_loads"])
-            cache["llc_miss_rate_pct"] = round(min(rate, 100.0), 6)
-        else:
-            cache["llc_miss_rate_pct"] = None
+        # Cache counters - always include all fields
+        cache.update({dst: perf_data.get(src) for src, dst in _CACHE_KEYS})
         
-        # TLB - always include all fields
-        memory_access["dtlb_loads"] = perf_data.get("dtlb_loads")
-        memory_access["dtlb_load_misses"] = perf_data.get("dtlb_load_misses")
-        memory_access["itlb_loads"] = perf_data.get("itlb_loads")
-        memory_access["itlb_load_misses"] = perf_data.get("itlb_load_misses")
-        if perf_data.get("dtlb_loads") and perf_data.get("dtlb_load_misses"):
-            rate = 100.0 * perf_data["dtlb_load_misses"] / max(1, perf_data["dtlb_loads"])
-            memory_access["dtlb_miss_rate_pct"] = round(min(rate, 100.0), 6)
-        else:
-            memory_access["dtlb_miss_rate_pct"] = None
-        if perf_data.get("itlb_loads") and perf_data.get("itlb_load_misses"):
-            rate = 100.0 * perf_data["itlb_load_misses"] / max(1, perf_data["itlb_loads"])
-            memory_access["itlb_miss_rate_pct"] = round(min(rate, 100.0), 6)
-        else:
-            memory_access["itlb_miss_rate_pct"] = None
+        # L1D / L1I / LLC miss rates
+        cache.update({dst: _miss_rate_pct(perf_data.get(misses), perf_data.get(loads))
+                      for dst, misses, loads in _CACHE_MISS_RATES})
         
-        # Page faults breakdown - always include all fields
-        memory_access["page_faults"] = perf_data.get("page_faults")
-        memory_access["minor_faults"] = perf_data.get("minor_faults")
-        memory_access["major_faults"] = perf_data.get("major_faults")
+        # TLB, page fault and fault-type counters - always include all fields
+        memory.update({dst: perf_data.get(src) for src, dst in _MEM_KEYS})
         
-        # Alignment and emulation faults - always include
-        memory_access["alignment_faults"] = perf_data.get("alignment_faults")
-        memory_access["emulation_faults"] = perf_data.get("emulation_faults")
+        # TLB miss rates
+        memory.update({dst: _miss_rate_pct(perf_data.get(misses), perf_data.get(loads))
+                       for dst, misses, loads in _TLB_MISS_RATES})
         
-        # Enhanced memory bandwidth estimation - always include all fields
-        # LLC misses represent traffic between cache and RAM (cache line = 64 bytes)
-        cache_line_bytes = 64
+        # Memory bandwidth estimation; fields left unset here keep their None seed
         elapsed = timing.get("elapsed_s", 0)
-        
         if elapsed > 0:
-            # Read bandwidth from LLC load misses
-            if perf_data.get("llc_load_misses") is not None:
-                read_bytes = perf_data["llc_load_misses"] * cache_line_bytes
-                memory_access["ram_read_bytes"] = read_bytes
-                memory_access["ram_read_mb"] = round(read_bytes / (1024 * 1024), 3)
-                memory_access["ram_read_bandwidth_mbps"] = round(read_bytes / (1024 * 1024 * elapsed), 3)
-            else:
-                memory_access["ram_read_bytes"] = None
-                memory_access["ram_read_mb"] = None
-                memory_access["ram_read_bandwidth_mbps"] = None
-            
-            # Write bandwidth from LLC store misses (if available)
-            if perf_data.get("llc_store_misses") is not None:
-                write_bytes = perf_data["llc_store_misses"] * cache_line_bytes
-                memory_access["ram_write_bytes"] = write_bytes
-                memory_access["ram_write_mb"] = round(write_bytes / (1024 * 1024), 3)
-                memory_access["ram_write_bandwidth_mbps"] = round(write_bytes / (1024 * 1024 * elapsed), 3)
-            else:
-                memory_access["ram_write_bytes"] = None
-                memory_access["ram_write_mb"] = None
-                memory_access["ram_write_bandwidth_mbps"] = None
+            inv_mbps = _INV_MB / elapsed
+            # LLC misses represent traffic between cache and RAM
+            for prefix, counters in _RAM_TRAFFIC:
+                if present >= counters:
+                    nbytes = sum(perf_data[c] for c in counters) * CACHE_LINE_BYTES
+                    memory[f"{prefix}_bytes"] = nbytes
+                    memory[f"{prefix}_mb"], memory[f"{prefix}_bandwidth_mbps"] = _mb_and_mbps(nbytes, inv_mbps)
             
-            # Total memory bandwidth (read + write)
-            if perf_data.get("llc_load_misses") is not None and perf_data.get("llc_store_misses") is not None:
-                total_bytes = (perf_data["llc_load_misses"] + perf_data["llc_store_misses"]) * cache_line_bytes
-                memory_access["ram_total_bytes"] = total_bytes
-                memory_access["ram_total_mb"] = round(total_bytes / (1024 * 1024), 3)
-                memory_access["ram_total_bandwidth_mbps"] = round(total_bytes / (1024 * 1024 * elapsed), 3)
-                
-                # Percentage breakdown
-                if total_bytes > 0:
-                    memory_access["ram_read_pct"] = round(100.0 * (perf_data["llc_load_misses"] * cache_line_bytes) / total_bytes, 2)
-                    memory_access["ram_write_pct"] = round(100.0 * (perf_data["llc_store_misses"] * cache_line_bytes) / total_bytes, 2)
-                else:
-                    memory_access["ram_read_pct"] = None
-                    memory_access["ram_write_pct"] = None
-            else:
-                memory_access["ram_total_bytes"] = None
-                memory_access["ram_total_mb"] = None
-                memory_access["ram_total_bandwidth_mbps"] = None
-                memory_access["ram_read_pct"] = None
-                memory_access["ram_write_pct"] = None
+            # Read/write percentage breakdown
+            if memory.get("ram_total_bytes"):
+                total_bytes = memory["ram_total_bytes"]
+                memory["ram_read_pct"] = round(100.0 * memory["ram_read_bytes"] / total_bytes, 2)
+                memory["ram_write_pct"] = round(100.0 * memory["ram_write_bytes"] / total_bytes, 2)
             
             # Alternative: L1 data cache traffic (gives cache-level bandwidth, not RAM)
-            # This shows total memory operations at L1 level (useful for comparison)
-            if perf_data.get("l1_dcache_loads") is not None and perf_data.get("l1_dcache_stores") is not None:
-                l1_traffic_bytes = (perf_data["l1_dcache_loads"] + perf_data["l1_dcache_stores"]) * cache_line_bytes
-                memory_access["l1_cache_traffic_mb"] = round(l1_traffic_bytes / (1024 * 1024), 3)
-                memory_access["l1_cache_bandwidth_mbps"] = round(l1_traffic_bytes / (1024 * 1024 * elapsed), 3)
-            else:
-                memory_access["l1_cache_traffic_mb"] = None
-                memory_access["l1_cache_bandwidth_mbps"] = None
-        else:
-            # No elapsed time - set all bandwidth fields to None
-            memory_access["ram_read_bytes"] = None
-            memory_access["ram_read_mb"] = None
-            memory_access["ram_read_bandwidth_mbps"] = None
-            memory_access["ram_write_bytes"] = None
-            memory_access["ram_write_mb"] = None
-            memory_access["ram_write_bandwidth_mbps"] = None
-            memory_access["ram_total_bytes"] = None
-            memory_access["ram_total_mb"] = None
-            memory_access["ram_total_bandwidth_mbps"] = None
-            memory_access["ram_read_pct"] = None
-            memory_access["ram_write_pct"] = None
-            memory_access["l1_cache_traffic_mb"] = None
-            memory_access["l1_cache_bandwidth_mbps"] = None
+            if {"l1_dcache_loads", "l1_dcache_stores"} <= present:
+                l1_traffic_bytes = (perf_data["l1_dcache_loads"] + perf_data["l1_dcache_stores"]) * CACHE_LINE_BYTES
+                memory["l1_cache_traffic_mb"], memory["l1_cache_bandwidth_mbps"] = _mb_and_mbps(l1_traffic_bytes, inv_mbps)
     else:
         # Provide a helpful note if perf wasn't usable
         if not perf_usable and perf_ok:
-            # Try to read paranoid level for context
-            level = None
-            try:
-                with open("/proc/sys/kernel/perf_event_paranoid", "r") as pf:
-                    level = pf.read().strip()
-            except Exception:
-                level = None
+            level = host["perf_paranoid"]
             cpu["note"] = f"perf unusable (perf_event_paranoid={level})" if level is not None else "perf unusable (permission restricted)"
 
-    # Detect number of threads by counting tasks in /proc during execution
-    # We'll run a quick check to see how many threads the process spawns
-    def count_threads(binary: str, args: list) -> int:
-        """Count threads by running the binary and checking /proc/{pid}/task/"""
-        try:
-            proc = subprocess.Popen([binary, *args], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-            time.sleep(0.01)  # Give it a moment to spawn threads
-            task_dir = f"/proc/{proc.pid}/task"
-            if os.path.exists(task_dir):
-                thread_count = len(os.listdir(task_dir))
-            else:
-                thread_count = 1
-            proc.terminate()
-            proc.wait(timeout=1)
-            return thread_count
-        except Exception:
-            return 1  # Default to single-threaded if we can't detect
-    
-    num_threads = count_threads(binary, program_args)
-    
     concurrency = {}
     if perf_data:
-        if "context_switches" in perf_data: concurrency["context_switches"] = perf_data["context_switches"]
-        if "cpu_migrations" in perf_data: concurrency["cpu_migrations"] = perf_data["cpu_migrations"]
+        concurrency.update({dst: perf_data[src] for src, dst in _SCHED_KEYS if src in perf_data})
         # Context switching rate
         if "context_switches" in perf_data and "elapsed_s" in timing and timing.get("elapsed_s"):
             concurrency["ctx_switches_per_second"] = round(perf_data["context_switches"] / timing["elapsed_s"], 3)
         if "cpu_migrations" in perf_data and "elapsed_s" in timing and timing.get("elapsed_s"):
             concurrency["migrations_per_second"] = round(perf_data["cpu_migrations"] / timing["elapsed_s"], 3)
     concurrency["threads"] = num_threads
+    concurrency["pinned_cpu"] = pin_cpu
+    concurrency["available_cpus"] = run_cpus
 
-    # Syscalls summary via strace -c
-    syscalls = run_strace_summary(binary, program_args)
-
-    # Combine memory and memory_access into one section - always include all fields
-    memory = {}
-    # TLB stats - always present
-    memory["dtlb_loads"] = memory_access.get("dtlb_loads")
-    memory["dtlb_load_misses"] = memory_access.get("dtlb_load_misses")
-    memory["dtlb_miss_rate_pct"] = memory_access.get("dtlb_miss_rate_pct")
-    memory["itlb_loads"] = memory_access.get("itlb_loads")
-    memory["itlb_load_misses"] = memory_access.get("itlb_load_misses")
-    memory["itlb_miss_rate_pct"] = memory_access.get("itlb_miss_rate_pct")
-    
-    # Page faults - always present
-    memory["page_faults"] = memory_access.get("page_faults")
-    memory["minor_faults"] = memory_access.get("minor_faults")
-    memory["major_faults"] = memory_access.get("major_faults")
-    
-    # Fault types - always present
-    memory["alignment_faults"] = memory_access.get("alignment_faults")
-    memory["emulation_faults"] = memory_access.get("emulation_faults")
-    
-    # RAM bandwidth (from LLC misses) - always present
-    memory["ram_read_bytes"] = memory_access.get("ram_read_bytes")
-    memory["ram_read_mb"] = memory_access.get("ram_read_mb")
-    memory["ram_read_bandwidth_mbps"] = memory_access.get("ram_read_bandwidth_mbps")
-    memory["ram_write_bytes"] = memory_access.get("ram_write_bytes")
-    memory["ram_write_mb"] = memory_access.get("ram_write_mb")
-    memory["ram_write_bandwidth_mbps"] = memory_access.get("ram_write_bandwidth_mbps")
-    memory["ram_total_bytes"] = memory_access.get("ram_total_bytes")
-    memory["ram_total_mb"] = memory_access.get("ram_total_mb")
-    memory["ram_total_bandwidth_mbps"] = memory_access.get("ram_total_bandwidth_mbps")
-    memory["ram_read_pct"] = memory_access.get("ram_read_pct")
-    memory["ram_write_pct"] = memory_access.get("ram_write_pct")
-    
-    # L1 cache bandwidth (total memory operations) - always present
-    memory["l1_cache_traffic_mb"] = memory_access.get("l1_cache_traffic_mb")
-    memory["l1_cache_bandwidth_mbps"] = memory_access.get("l1_cache_bandwidth_mbps")
-    
     # Max RSS from /usr/bin/time -v
-    max_rss_kb = run_max_rss_kb(binary, program_args)
     if max_rss_kb is not None:
         memory["max_rss_kb"] = max_rss_kb
     
     # Valgrind Massif
-    memory.update(run_valgrind(binary, program_args))
+    if massif is not None:
+        memory.update(massif)
     
     # Valgrind Memcheck leak summary
-    memcheck = run_valgrind_memcheck(binary, program_args)
     if memcheck:
         memory["memcheck"] = memcheck
 
-    # --- Ensure stable schema: fill missing keys with explicit None defaults ---
-    default_timing = {
-        "elapsed_s": None,
-        "user_s": None,
-        "sys_s": None,
-        "wait_time_s": None,
-        "task_clock_ms": None,
-        "cpu_utilization_pct": None,
-        "cpu_utilization_per_core_pct": None,
-    }
-
-    default_cpu = {
-        "instructions": None,
-        "cycles": None,
-        "ref_cycles": None,
-        "ipc": None,
-        "frequency_ratio": None,
-        "stalled_cycles_frontend": None,
-        "frontend_stall_pct": None,
-        "stalled_cycles_backend": None,
-        "backend_stall_pct": None,
-        "branches": None,
-        "branch_misses": None,
-        "branch_miss_rate_pct": None,
-        "instructions_per_second": None,
-        "note": None,
-    }
-
-    default_cache = {
-        "l1d_loads": None,
-        "l1d_load_misses": None,
-        "l1d_stores": None,
-        "l1d_miss_rate_pct": None,
-        "l1i_loads": None,
-        "l1i_load_misses": None,
-        "l1i_miss_rate_pct": None,
-        "llc_loads": None,
-        "llc_load_misses": None,
-        "llc_stores": None,
-        "llc_store_misses": None,
-        "llc_miss_rate_pct": None,
-    }
-
-    default_concurrency = {
-        "context_switches": None,
-        "cpu_migrations": None,
-        "ctx_switches_per_second": None,
-        "migrations_per_second": None,
-        "threads": num_threads if 'num_threads' in locals() else None,
-    }
-
-    default_memory = {
-        # TLB
-        "dtlb_loads": None,
-        "dtlb_load_misses": None,
-        "dtlb_miss_rate_pct": None,
-        "itlb_loads": None,
-        "itlb_load_misses": None,
-        "itlb_miss_rate_pct": None,
-        # Page faults
-        "page_faults": None,
-        "minor_faults": None,
-        "major_faults": None,
-        # Fault types
-        "alignment_faults": None,
-        "emulation_faults": None,
-        # RAM bandwidth
-        "ram_read_bytes": None,
-        "ram_read_mb": None,
-        "ram_read_bandwidth_mbps": None,
-        "ram_write_bytes": None,
-        "ram_write_mb": None,
-        "ram_write_bandwidth_mbps": None,
-        "ram_total_bytes": None,
-        "ram_total_mb": None,
-        "ram_total_bandwidth_mbps": None,
-        "ram_read_pct": None,
-        "ram_write_pct": None,
-        # L1 cache traffic
-        "l1_cache_traffic_mb": None,
-        "l1_cache_bandwidth_mbps": None,
-        # Max RSS
-        "max_rss_kb": None,
-        # Massif peaks
-        "massif_peak_heap_bytes": None,
-        "massif_peak_heap_extra_bytes": None,
-        "massif_peak_total_bytes": None,
-        "massif_peak_stacks_bytes": None,
-        "massif_peak_time": None,
-        "massif_peak_snapshot": None,
-        # Memcheck
-        "memcheck": None,
-    }
-
-    # Binary footprint defaults
-    default_footprint = {
-        "unstripped_bytes": None,
-        "stripped_bytes": None,
-        "sections": None,
-    }
+    # Huge-page comparison run
+    if hugepages is not None:
+        memory["hugepages"] = hugepages
 
+    # --- Ensure stable schema: fill missing keys with explicit None defaults ---
     # Ensure top-level dicts include all expected keys (fill with None when absent)
-    ensure_keys(timing, default_timing)
-    ensure_keys(cpu, default_cpu)
-    ensure_keys(cache, default_cache)
-    ensure_keys(concurrency, default_concurrency)
-    ensure_keys(memory, default_memory)
-    ensure_keys(result := {}, {})  # ensure result exists for later construction (no-op)
-
-    # Apply defaults to binary footprint container
-    # `unstripped_size` and `stripped_size` already computed; keep them but ensure keys exist
+    ensure_keys(timing, TIMING_FIELDS)
+    ensure_keys(cpu, CPU_FIELDS)
+    ensure_keys(cache, CACHE_FIELDS)
+    ensure_keys(concurrency, CONCURRENCY_FIELDS)
+    ensure_keys(memory, MEMORY_FIELDS)
+
+    # Binary footprint section; stripped size/sections may be None when the probes failed
     binary_footprint = {
-        "unstripped_bytes": unstripped_size if 'unstripped_size' in locals() else None,
-        "stripped_bytes": stripped_size if 'stripped_size' in locals() else None,
+        "unstripped_bytes": unstripped_size,
+        "stripped_bytes": stripped_size,
         "sections": mem_sections,
     }
-    ensure_keys(binary_footprint, default_footprint)
+    ensure_keys(binary_footprint, FOOTPRINT_FIELDS)
 
     # Ensure syscalls output is always a dict with either syscalls/total or raw
     if not isinstance(syscalls, dict):
@@ -1004,11 +1298,7 @@ def main():
     result = {
         "binary": os.path.basename(binary),
         "architecture": arch,
-        "binary_footprint": {
-            "unstripped_bytes": unstripped_size,
-            "stripped_bytes": stripped_size,
-            "sections": mem_sections,
-        },
+        "binary_footprint": binary_footprint,
         "timing": timing,
         "cpu": cpu,
         "cache": cache,
@@ -1017,9 +1307,11 @@ def main():
         "memory": memory
     }
 
-    with open(output_path, "w") as f:
-        json.dump(result, f, indent=2)
-    print(json.dumps(result, indent=2))
+    # Serialize once and write the same bytes to both sinks
+    blob = _dumps(result)
+    with open(output_path, "wb") as f:
+        f.write(blob)
+    sys.stdout.buffer.write(blob + b"\n")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file